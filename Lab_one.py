@@ -1,63 +1,199 @@
-def function(x, z):
-    inputs = ["внесение денег", "нажатие кнопки выбора продукта", "нажатие кнопки отмены", "таймер(2мин)"]
-    output = ["выдан продукт", "сброс суммы", "показать сумму", "отказ от денег", "таймер истек"]
-    states = ["выдача продукта", "ожидание выбора", "продукт выбран"]
-    matrix_one = [
-        [0, 1, 0],  # x1: z1=0, z2=1, z1=0
-        [0, 2, 2],  # x2: z1=0, z3=2, z3=2
-        [1, 1, 1],  # x3: z2=1, z2=1, z2=1
-        [1, 1, 1]  # x4: z2=1, z2=1, z2=1
-    ]
-    matrix_two = [
-        [3, 3, 2],  # x1: y4=3, y4=3, y3=2
-        [0, 2, 1],  # x2: y1=0, y3=2, y2=1
-        [0, 1, 1],  # x3: y1=0, y2=1, y2=1
-        [4, 4, 4]  # x4: y5=4, y5=4, y5=4
-    ]
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, product
+
+import numpy as np
+
+INPUTS = ["внесение денег", "нажатие кнопки выбора продукта", "нажатие кнопки отмены", "таймер(2мин)"]
+OUTPUTS = ["выдан продукт", "сброс суммы", "показать сумму", "отказ от денег", "таймер истек"]
+STATES = ["выдача продукта", "ожидание выбора", "продукт выбран"]
+MATRIX_ONE = [
+    [0, 1, 0],  # x1: z1=0, z2=1, z1=0
+    [0, 2, 2],  # x2: z1=0, z3=2, z3=2
+    [1, 1, 1],  # x3: z2=1, z2=1, z2=1
+    [1, 1, 1]  # x4: z2=1, z2=1, z2=1
+]
+MATRIX_TWO = [
+    [3, 3, 2],  # x1: y4=3, y4=3, y3=2
+    [0, 2, 1],  # x2: y1=0, y3=2, y2=1
+    [0, 1, 1],  # x3: y1=0, y2=1, y2=1
+    [4, 4, 4]  # x4: y5=4, y5=4, y5=4
+]
+INITIAL_STATE = 1
+
 
+def function(x, z):
     print("Входные сигналы:")
-    for i, signal in enumerate(inputs, 1):
+    for i, signal in enumerate(INPUTS, 1):
         print(f"{i}. {signal}")
 
     print("Доступные состояния:")
-    for i, state in enumerate(states, 1):
+    for i, state in enumerate(STATES, 1):
         print(f"{i}. {state}")
 
-    next_state = matrix_one[x][z]
-    output_sigma = matrix_two[x][z]
-    z_next = states[next_state]
-    y = output[output_sigma]
+    next_state = MATRIX_ONE[x][z]
+    output_sigma = MATRIX_TWO[x][z]
+    z_next = STATES[next_state]
+    y = OUTPUTS[output_sigma]
 
-    print(f"Входной сигнал: {inputs[x]}")
-    print(f"Текущее состояние: {states[z]}")
+    print(f"Входной сигнал: {INPUTS[x]}")
+    print(f"Текущее состояние: {STATES[z]}")
     print(f"Следующее состояние: {z_next}")
     print(f"Выходной сигнал: {y}")
     return next_state
 
 
+class VendingAutomaton:
+    """Автомат с таблицами переходов и выходов, скомпилированными в массивы NumPy.
+
+    Последовательность входов обрабатывается блоками по block символов: для
+    каждого кода блока и состояния на входе в блок заранее посчитаны все
+    промежуточные состояния, поэтому по Python проходит только цепочка
+    состояний на границах блоков, а остальное - выборки из таблиц.
+    """
+
+    def __init__(self, transitions=MATRIX_ONE, outputs=MATRIX_TWO, block=8):
+        self.transitions = np.asarray(transitions, dtype=np.int8)  # [вход, состояние] -> состояние
+        self.outputs = np.asarray(outputs, dtype=np.int8)  # [вход, состояние] -> выход
+        self.num_inputs, self.num_states = self.transitions.shape
+        # таблица блоков не больше 2**16 кодов
+        while block > 1 and self.num_inputs ** block > 2 ** 16:
+            block -= 1
+        self.block = block
+
+        num_codes = self.num_inputs ** block
+        self._powers = self.num_inputs ** np.arange(block - 1, -1, -1)
+        digits = (np.arange(num_codes)[:, None] // self._powers) % self.num_inputs
+        self.block_states = np.empty((num_codes, self.num_states, block), dtype=np.int8)
+        z = np.tile(np.arange(self.num_states), (num_codes, 1))
+        for j in range(block):
+            z = self.transitions[digits[:, j][:, None], z]
+            self.block_states[:, :, j] = z
+        self._block_exit = self.block_states[:, :, -1].tolist()
+        self._transitions_list = self.transitions.tolist()
+
+        # Отображения состояний в состояния (функции "вход в блок -> выход") с номерами
+        # и таблица их композиции с кодом блока; нужна для параллельного прохода
+        self._maps = np.array(list(product(range(self.num_states), repeat=self.num_states)), dtype=np.intp)
+        self._map_weights = self.num_states ** np.arange(self.num_states - 1, -1, -1)
+        composed = self.block_states[:, :, -1][:, self._maps]  # [код, отображение, состояние]
+        self._map_compose = (composed @ self._map_weights).T.tolist()  # [отображение][код]
+        self._identity_map = int(np.arange(self.num_states) @ self._map_weights)
+
+    def step(self, x, z):
+        """Один переход без вывода на экран: (следующее состояние, выход)"""
+        return self._transitions_list[x][z], int(self.outputs[x, z])
+
+    def run(self, input_codes, initial_state=INITIAL_STATE):
+        """Обработка всей последовательности кодов входов (с 0).
+
+        Возвращает массивы состояний после каждого входа и выходных сигналов.
+        """
+        x = np.asarray(input_codes, dtype=np.intp)
+        if x.size and (x.min() < 0 or x.max() >= self.num_inputs):
+            raise ValueError(f"коды входов должны быть от 0 до {self.num_inputs - 1}")
+        n = len(x)
+        num_blocks = n // self.block
+
+        states = np.empty(n, dtype=np.int8)
+        z = initial_state
+        if num_blocks:
+            codes = x[:num_blocks * self.block].reshape(num_blocks, self.block) @ self._powers
+            exits = self._block_exit
+            entries = list(accumulate(codes.tolist(), lambda state, code: exits[code][state], initial=z))
+            z = entries.pop()
+            states[:num_blocks * self.block] = self.block_states[codes, entries].ravel()
+        for i in range(num_blocks * self.block, n):
+            z = self._transitions_list[x[i]][z]
+            states[i] = z
+
+        previous = np.empty(n, dtype=np.intp)
+        if n:
+            previous[0] = initial_state
+            previous[1:] = states[:-1]
+        return states, self.outputs[x, previous]
+
+    def chunk_map(self, input_codes):
+        """Композиция переходов по всему куску: кортеж конечных состояний для каждого начального"""
+        x = np.asarray(input_codes, dtype=np.intp)
+        num_blocks = len(x) // self.block
+        map_id = self._identity_map
+        if num_blocks:
+            codes = x[:num_blocks * self.block].reshape(num_blocks, self.block) @ self._powers
+            compose = self._map_compose
+            for code in codes.tolist():
+                map_id = compose[map_id][code]
+        mapping = self._maps[map_id].tolist()
+        for code in x[num_blocks * self.block:].tolist():
+            mapping = [self._transitions_list[code][z] for z in mapping]
+        return tuple(mapping)
+
+    def run_parallel(self, input_codes, initial_state=INITIAL_STATE, workers=None, chunk_size=1 << 22):
+        """То же, что run(), но с разбиением длинной последовательности на куски по процессам.
+
+        Каждый вход - функция из состояний в состояния, а композиция функций
+        ассоциативна. Сначала процессы параллельно считают композицию своих
+        кусков, затем короткий последовательный проход по кускам дает
+        состояние на входе в каждый кусок, и куски снова параллельно
+        разворачиваются в состояния и выходы. Результат совпадает с run().
+        """
+        x = np.asarray(input_codes)
+        if x.size and (x.min() < 0 or x.max() >= self.num_inputs):
+            raise ValueError(f"коды входов должны быть от 0 до {self.num_inputs - 1}")
+        # коды входов умещаются в байт - куски дешевле передавать в процессы
+        x = x.astype(np.int8 if self.num_inputs <= 127 else np.intp, copy=False)
+        chunks = [x[start:start + chunk_size] for start in range(0, len(x), chunk_size)]
+        if len(chunks) <= 1:
+            return self.run(x, initial_state)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_automaton_worker,
+                                 initargs=(self.transitions, self.outputs, self.block)) as executor:
+            maps = list(executor.map(_chunk_map_worker, chunks))
+            entries = list(accumulate(maps[:-1], lambda state, mapping: mapping[state], initial=initial_state))
+            parts = list(executor.map(_chunk_run_worker, chunks, entries))
+        states = np.concatenate([part[0] for part in parts])
+        outputs = np.concatenate([part[1] for part in parts])
+        return states, outputs
+
+
+# Автомат процесса пула для run_parallel: строится один раз на процесс
+_worker_automaton = None
+
+
+def _init_automaton_worker(transitions, outputs, block):
+    global _worker_automaton
+    _worker_automaton = VendingAutomaton(transitions, outputs, block)
+
+
+def _chunk_map_worker(chunk):
+    return _worker_automaton.chunk_map(chunk)
+
+
+def _chunk_run_worker(chunk, initial_state):
+    return _worker_automaton.run(chunk, initial_state)
+
+
 def show_available_inputs():
-    inputs = ["внесение денег", "нажатие кнопки выбора продукта", "нажатие кнопки отмены", "таймер(2мин)"]
     print("\nДоступные входные сигналы:")
-    for i, signal in enumerate(inputs, 1):
+    for i, signal in enumerate(INPUTS, 1):
         print(f"{i}. {signal}")
 
 
-current_state = 1
-states = ["выдача продукта", "ожидание выбора", "продукт выбран"]
+if __name__ == "__main__":
+    current_state = INITIAL_STATE
 
-while True:
-    print(f"\nТекущее состояние: {states[current_state]}")
-    show_available_inputs()
+    while True:
+        print(f"\nТекущее состояние: {STATES[current_state]}")
+        show_available_inputs()
 
-    x = int(input("Введите номер входного сигнала: ")) - 1
+        x = int(input("Введите номер входного сигнала: ")) - 1
 
-    if x < 0 or x > 3:
-        print("Ошибка: неверный номер сигнала. Введите число от 1 до 4.")
-        continue
+        if x < 0 or x > 3:
+            print("Ошибка: неверный номер сигнала. Введите число от 1 до 4.")
+            continue
 
-    current_state = function(x, current_state)
+        current_state = function(x, current_state)
 
-    input_solve = input("\nВведите 'stop' чтобы остановить программу или нажмите Enter чтобы продолжить: ")
-    if input_solve.lower() == "stop":
-        break
-    print()
\ No newline at end of file
+        input_solve = input("\nВведите 'stop' чтобы остановить программу или нажмите Enter чтобы продолжить: ")
+        if input_solve.lower() == "stop":
+            break
+        print()
@@ -0,0 +1,233 @@
+"""Потоковая обработка событий парка торговых автоматов Lab_one.
+
+Записи "machine_id,input_code" (коды входов с 0, как в VendingAutomaton)
+читаются пачками из файла или из сокета, состояния всех автоматов хранятся
+в одном массиве по номеру автомата, а на выход пишутся строки
+"machine_id,output_code" в порядке поступления записей.
+
+Примеры:
+    python -m Lab_one_fleet events.csv --out outputs.csv
+    python -m Lab_one_fleet --port 8765
+"""
+import argparse
+import asyncio
+import sys
+
+import numpy as np
+
+from Lab_one import INITIAL_STATE, MATRIX_ONE, MATRIX_TWO
+
+
+def event_rounds(machine_ids, max_rounds=64):
+    """Деление пачки событий на раунды по номеру вхождения автомата.
+
+    В каждом раунде номера автоматов различны, а события одного автомата
+    попадают в раунды в порядке записей. Раундов не больше max_rounds:
+    события "горячих" автоматов сверх этого числа возвращаются вторым
+    значением (в порядке записей) для поэлементной обработки после раундов.
+    """
+    order = np.argsort(machine_ids, kind='stable')
+    sorted_ids = machine_ids[order]
+    group_start = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    group_sizes = np.diff(np.r_[group_start, len(sorted_ids)])
+    if group_sizes.max() == 1:
+        return [np.arange(len(machine_ids))], np.empty(0, dtype=np.intp)
+    # номер вхождения каждого события среди событий того же автомата
+    ranks = np.empty(len(machine_ids), dtype=np.intp)
+    ranks[order] = np.arange(len(sorted_ids)) - np.repeat(group_start, group_sizes)
+    overflow = np.flatnonzero(ranks >= max_rounds)
+    by_rank = np.argsort(np.minimum(ranks, max_rounds), kind='stable')
+    counts = np.bincount(np.minimum(ranks, max_rounds), minlength=max_rounds + 1)
+    rounds = np.split(by_rank[:len(machine_ids) - len(overflow)], np.cumsum(counts[:-1])[:-1])
+    return [events for events in rounds if len(events)], overflow
+
+
+class FleetProcessor:
+    """Состояния парка автоматов и пакетное применение таблиц переходов"""
+
+    def __init__(self, num_machines=0, transitions=MATRIX_ONE, outputs=MATRIX_TWO, initial_state=INITIAL_STATE):
+        self.transitions = np.asarray(transitions, dtype=np.int8)
+        self.outputs = np.asarray(outputs, dtype=np.int8)
+        self.initial_state = initial_state
+        self.states = np.full(num_machines, initial_state, dtype=np.int8)
+        self.processed = 0
+
+    def _ensure_capacity(self, max_id):
+        if max_id >= len(self.states):
+            grown = np.full(max(max_id + 1, 2 * len(self.states)), self.initial_state, dtype=np.int8)
+            grown[:len(self.states)] = self.states
+            self.states = grown
+
+    def process_batch(self, machine_ids, input_codes):
+        """Применение пачки событий; возвращает выходные сигналы в порядке записей.
+
+        События одного автомата внутри пачки должны применяться по порядку,
+        поэтому пачка делится на раунды (event_rounds): в каждом раунде
+        переход делается одной выборкой по массивам, а события сверх
+        предела раундов применяются по одному.
+        """
+        machine_ids = np.asarray(machine_ids, dtype=np.intp)
+        input_codes = np.asarray(input_codes, dtype=np.intp)
+        outputs = np.empty(len(machine_ids), dtype=np.int8)
+        if not len(machine_ids):
+            return outputs
+        if machine_ids.min() < 0:
+            raise ValueError("номер автомата не может быть отрицательным")
+        if input_codes.min() < 0 or input_codes.max() >= len(self.transitions):
+            raise ValueError(f"коды входов должны быть от 0 до {len(self.transitions) - 1}")
+        self._ensure_capacity(int(machine_ids.max()))
+
+        rounds, overflow = event_rounds(machine_ids)
+        for events in rounds:
+            ids = machine_ids[events]
+            codes = input_codes[events]
+            current = self.states[ids]
+            outputs[events] = self.outputs[codes, current]
+            self.states[ids] = self.transitions[codes, current]
+        # хвосты "горячих" автоматов - по одному событию, без раунда на каждое
+        if len(overflow):
+            transitions = self.transitions.tolist()
+            table = self.outputs.tolist()
+            states = self.states
+            for i, m, x in zip(overflow.tolist(), machine_ids[overflow].tolist(), input_codes[overflow].tolist()):
+                z = states[m]
+                outputs[i] = table[x][z]
+                states[m] = transitions[x][z]
+        self.processed += len(machine_ids)
+        return outputs
+
+
+def parse_records(lines):
+    """Строки "machine_id,input_code" -> два массива"""
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    records = np.loadtxt(lines, delimiter=',', dtype=np.int64, ndmin=2)
+    return records[:, 0], records[:, 1]
+
+
+def format_outputs(machine_ids, outputs):
+    return ''.join(f'{m},{y}\n' for m, y in zip(machine_ids.tolist(), outputs.tolist())).encode()
+
+
+def _complete_lines(tail, chunk):
+    """Целые строки из хвоста прошлого куска и нового куска; остаток - новый хвост"""
+    data = tail + chunk
+    cut = data.rfind(b'\n') + 1
+    return data[:cut].decode().splitlines(), data[cut:]
+
+
+async def file_batches(path, chunk_size=1 << 20):
+    """Пачки записей из текстового файла; чтение идет в отдельном потоке"""
+    tail = b''
+    with open(path, 'rb') as f:
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            lines, tail = _complete_lines(tail, chunk)
+            if lines:
+                yield lines
+    if tail.strip():
+        yield [tail.decode()]
+
+
+async def stream_batches(reader, chunk_size=1 << 20):
+    """Пачки записей из asyncio.StreamReader по мере поступления данных"""
+    tail = b''
+    while chunk := await reader.read(chunk_size):
+        lines, tail = _complete_lines(tail, chunk)
+        if lines:
+            yield lines
+    if tail.strip():
+        yield [tail.decode()]
+
+
+async def process_stream(batches, processor, write, lock=None, queue_size=4):
+    """Конвейер: чтение и разбор следующих пачек идет, пока обрабатывается текущая.
+
+    batches - асинхронный итератор списков строк, write - корутина записи байтов.
+    lock разделяет один processor между несколькими потоками записей.
+    """
+    queue = asyncio.Queue(maxsize=queue_size)
+
+    async def ingest():
+        # признак конца ставится и при ошибке чтения или разбора, иначе обработчик
+        # ждал бы вечно; сама ошибка поднимается из await reader_task
+        try:
+            async for lines in batches:
+                await queue.put(await asyncio.to_thread(parse_records, lines))
+        except Exception:
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    reader_task = asyncio.create_task(ingest())
+    try:
+        while (batch := await queue.get()) is not None:
+            machine_ids, input_codes = batch
+            if lock is None:
+                outputs = await asyncio.to_thread(processor.process_batch, machine_ids, input_codes)
+            else:
+                async with lock:
+                    outputs = await asyncio.to_thread(processor.process_batch, machine_ids, input_codes)
+            await write(format_outputs(machine_ids, outputs))
+        await reader_task
+    finally:
+        reader_task.cancel()
+
+
+async def process_file(path, out, processor=None, chunk_size=1 << 20):
+    """Обработка файла событий с записью выходов в файловый объект out (байты)"""
+    processor = processor or FleetProcessor()
+
+    async def write(data):
+        await asyncio.to_thread(out.write, data)
+
+    await process_stream(file_batches(path, chunk_size), processor, write)
+    return processor
+
+
+async def serve(host, port, processor=None, chunk_size=1 << 20):
+    """TCP-сервер: каждое соединение присылает записи и получает выходные сигналы"""
+    processor = processor or FleetProcessor()
+    lock = asyncio.Lock()
+
+    async def handle(reader, writer):
+        async def write(data):
+            writer.write(data)
+            await writer.drain()
+
+        try:
+            await process_stream(stream_batches(reader, chunk_size), processor, write, lock)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потоковая обработка событий парка автоматов")
+    parser.add_argument('events', nargs='?', help="файл записей machine_id,input_code")
+    parser.add_argument('--out', help="файл выходных сигналов (по умолчанию stdout)")
+    parser.add_argument('--machines', type=int, default=0, help="ожидаемое число автоматов")
+    parser.add_argument('--chunk-size', type=int, default=1 << 20, help="байт на одно чтение")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help="слушать TCP-порт вместо чтения файла")
+    args = parser.parse_args(argv)
+
+    processor = FleetProcessor(args.machines)
+    if args.port is not None:
+        asyncio.run(serve(args.host, args.port, processor, args.chunk_size))
+        return
+    if not args.events:
+        parser.error("нужно указать файл событий или --port")
+    if args.out:
+        with open(args.out, 'wb') as out:
+            asyncio.run(process_file(args.events, out, processor, args.chunk_size))
+    else:
+        asyncio.run(process_file(args.events, sys.stdout.buffer, processor, args.chunk_size))
+    print(f"обработано событий: {processor.processed}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,80 +1,451 @@
+"""Модель магазина: СМО с отказами и несколькими кассами.
+
+Модуль не зависит от Qt и matplotlib - окно находится в Lab_three_gui.
+Без аргументов открывается окно, с аргументами - пакетный прогон:
+    python -m Lab_three --arrival-rate 2 --runs 1000 --seed 1 --out result.json
+    python -m Lab_three --arrival-rate 1 --runs 200 --antithetic --compare-service-times 3,4,5,7
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import json
 import math
+import multiprocessing
+import os
+import queue
+import statistics
 import sys
 import threading
 import random
-import simpy
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import numpy as np
-from PySide6 import QtCore, QtWidgets
-from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QSpinBox, QPushButton, QGroupBox, QDoubleSpinBox, QProgressBar
-)
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
+
+
+# Виды событий ядра 'heap'; освобождение кассы раньше прибытия в тот же момент
+DEPARTURE = 0
+ARRIVAL = 1
+
+# Версия модели: меняется, когда при тех же параметрах и seed меняются результаты
+# (2 - поток случайных чисел на репликацию, 3 - загрузка по времени занятости,
+# 4 - загрузка в 'heap' считается тем же выражением, что в 'simpy')
+MODEL_VERSION = 4
+
+# Фиксированное время для каждой кассы по умолчанию
+DEFAULT_SERVICE_TIMES = (3, 4, 5, 6)  # касса0=3мин, касса1=4мин, касса2=5мин, касса3=6мин
+
+# Распределения времени обслуживания; service_times задает среднее для каждой кассы:
+# 'fixed' - ровно среднее, 'exponential' - показательное, 'uniform' - равномерное
+# на [t(1 - spread), t(1 + spread)]
+SERVICE_DISTRIBUTIONS = ('fixed', 'exponential', 'uniform')
+
+
+def service_factor(distribution, u, spread=0.5):
+    """Множитель к среднему времени кассы по равномерному числу u (обратное преобразование)"""
+    if distribution == 'exponential':
+        return -math.log(1.0 - u)
+    if distribution == 'uniform':
+        return 1.0 + spread * (2.0 * u - 1.0)
+    return 1.0
 
 
 class Cashier:
-    def __init__(self, id):
+    def __init__(self, id, service_time=None):
         self.id = id
         self.busy = False
         self.served_count = 0
-        # Фиксированное время для каждой кассы
-        service_times = [3, 4, 5, 6]  # касса0=3мин, касса1=4мин, касса2=5мин, касса3=6мин
-        self.service_time = service_times[id]
+        self.busy_time = 0.0  # время занятости в пределах моделирования
+        self.service_time = DEFAULT_SERVICE_TIMES[id] if service_time is None else service_time
 
     def __repr__(self):
         return f"Касса{self.id + 1}({self.service_time}мин):{self.served_count}клиентов"
 
 
+# Уровни трассировки событий: выключена, только ушедшие клиенты, все клиенты
+TRACE_OFF = 0
+TRACE_REFUSALS = 1
+TRACE_ALL = 2
+
+# Исходы клиента в трассе
+SERVED = 0
+ABANDONED = 1
+OUTCOME_NAMES = ('served', 'abandoned')
+
+
+class EventTrace:
+    """Запись событий клиентов (run, time, customer_id, cashier, outcome) в файл.
+
+    Записи копятся в буфере и пачками передаются фоновому потоку, который
+    пишет их в CSV или, для файлов .bin, в двоичный массив TRACE_DTYPE.
+    Модель обращается к трассе, только если она задана и уровень достаточен,
+    поэтому выключенная трассировка почти ничего не стоит.
+    """
+    TRACE_DTYPE = np.dtype([
+        ('run', np.int32),
+        ('time', np.float64),
+        ('customer_id', np.int32),
+        ('cashier', np.int16),
+        ('outcome', np.int8),
+    ])
+
+    def __init__(self, path, level=TRACE_ALL, batch_size=65536):
+        self.path = path
+        self.level = level
+        self.batch_size = batch_size
+        self.binary = path.endswith('.bin')
+        # файл открывается здесь, чтобы неверный путь был виден сразу, а не в фоновом потоке
+        self._file = open(path, 'wb') if self.binary else open(path, 'w', newline='')
+        self._csv = None
+        if not self.binary:
+            self._csv = csv.writer(self._file)
+            self._csv.writerow([name for name in self.TRACE_DTYPE.names])
+        self._error = None  # исключение фонового потока; поднимается из flush() и close()
+        self._buffer = []
+        self._queue = queue.Queue(maxsize=16)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def record(self, run, time, customer_id, cashier, outcome):
+        self._buffer.append((run, time, customer_id, cashier, outcome))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def record_many(self, runs, times, customer_ids, cashiers, outcome):
+        """Пачка записей с одинаковым исходом из массивов NumPy"""
+        self._buffer.extend(zip(runs.tolist(), times.tolist(), customer_ids.tolist(), cashiers.tolist(),
+                                [outcome] * len(runs)))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"ошибка записи трассы в {self.path}") from self._error
+
+    def flush(self):
+        self._raise_error()
+        if self._buffer:
+            self._queue.put(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        try:
+            if self._error is None:
+                self.flush()
+        finally:
+            self._queue.put(None)
+            self._writer.join()
+            try:
+                self._file.close()
+            except OSError as error:
+                self._error = self._error or error
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_loop(self):
+        # после ошибки очередь продолжает разбираться, чтобы flush() не блокировался
+        while (batch := self._queue.get()) is not None:
+            if self._error is not None:
+                continue
+            try:
+                if self.binary:
+                    np.array(batch, dtype=self.TRACE_DTYPE).tofile(self._file)
+                else:
+                    self._csv.writerows((run, time, customer_id, cashier, OUTCOME_NAMES[outcome])
+                                        for run, time, customer_id, cashier, outcome in batch)
+            except Exception as error:
+                self._error = error
+
+
+# До этого числа касс с разными временами используется точная CTMC (2**n состояний)
+MAX_CTMC_CASHIERS = 12
+
+
+def erlang_b(servers, offered_load):
+    """Вероятность отказа по формуле Эрланга B (устойчивая рекуррентная форма)"""
+    blocking = 1.0
+    for k in range(1, servers + 1):
+        blocking = offered_load * blocking / (k + offered_load * blocking)
+    return blocking
+
+
+def _ordered_loss_ctmc(arrival_rate, service_times):
+    """Стационарное распределение цепи по маскам занятых касс.
+
+    Клиент занимает свободную кассу с наименьшим номером; обслуживание
+    считается экспоненциальным со средним service_times[i].
+    """
+    num_cashiers = len(service_times)
+    num_states = 1 << num_cashiers
+    rates = [1 / t for t in service_times]
+    generator = np.zeros((num_states, num_states))
+    for state in range(num_states):
+        for i in range(num_cashiers):
+            if not state >> i & 1:
+                generator[state, state | 1 << i] += arrival_rate
+                break
+        for i in range(num_cashiers):
+            if state >> i & 1:
+                generator[state, state & ~(1 << i)] += rates[i]
+        generator[state, state] = -generator[state].sum()
+
+    # pi * Q = 0, sum(pi) = 1: одно уравнение баланса заменяется нормировкой
+    system = generator.T.copy()
+    system[-1] = 1.0
+    rhs = np.zeros(num_states)
+    rhs[-1] = 1.0
+    return np.linalg.solve(system, rhs)
+
+
+def analytic_loss_model(arrival_rate, service_times=DEFAULT_SERVICE_TIMES):
+    """Ожидаемая доля отказов и загрузка касс без моделирования.
+
+    Одинаковые кассы - формула Эрланга B, точная для любого распределения
+    времени обслуживания. Разные кассы с выбором первой свободной - CTMC с
+    экспоненциальным обслуживанием (приближение для фиксированных времен),
+    а при числе касс больше MAX_CTMC_CASHIERS - грубое приближение
+    последовательного переполнения (каждая касса видит пуассоновский поток
+    отказов предыдущих), пригодное только для отсева вариантов.
+    Значения в процентах, как в результатах моделирования.
+    """
+    if arrival_rate == 0:
+        raise ValueError("lambda должен быть не нулевым")
+    service_times = [float(t) for t in service_times]
+    num_cashiers = len(service_times)
+
+    if len(set(service_times)) == 1:
+        offered_load = arrival_rate * service_times[0]
+        # занятость касс при упорядоченном выборе: разность Эрланга B для k-1 и k касс
+        blocking = [erlang_b(k, offered_load) for k in range(num_cashiers + 1)]
+        utilization = [offered_load * (blocking[k] - blocking[k + 1]) for k in range(num_cashiers)]
+        refusal = blocking[-1]
+        method = 'erlang-b'
+    elif num_cashiers <= MAX_CTMC_CASHIERS:
+        pi = _ordered_loss_ctmc(arrival_rate, service_times)
+        states = np.arange(len(pi))
+        utilization = [float(pi[(states >> i & 1).astype(bool)].sum()) for i in range(num_cashiers)]
+        refusal = float(pi[-1])
+        method = 'ctmc'
+    else:
+        utilization = []
+        overflow = arrival_rate
+        for service_time in service_times:
+            load = overflow * service_time
+            utilization.append(load / (1 + load))
+            overflow *= load / (1 + load)
+        refusal = overflow / arrival_rate
+        method = 'overflow'
+
+    return {
+        'refusal_rate': refusal * 100,
+        'cashier_utilization': [u * 100 for u in utilization],
+        'method': method,
+    }
+
+
+class RunningStats:
+    """Онлайн-среднее и дисперсия вектора величин (алгоритм Уэлфорда)"""
+
+    def __init__(self, size):
+        self.count = 0
+        self.mean = np.zeros(size)
+        self._m2 = np.zeros(size)
+
+    def update(self, values):
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (values - self.mean)
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return np.zeros_like(self._m2)
+        return self._m2 / (self.count - 1)
+
+    def half_width(self, confidence=0.95):
+        """Полуширина доверительного интервала среднего (нормальное приближение)"""
+        if self.count < 2:
+            return np.full_like(self._m2, np.inf)
+        z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        return z * np.sqrt(self.variance / self.count)
+
+
 class EnhancedQueueSimulation(threading.Thread):
-    def __init__(self, arrival_rate, num_runs=1):
+    # Движки моделирования: 'simpy' - процессная модель, 'numpy' - векторизованный пакетный прогон,
+    # 'heap' - собственное ядро дискретных событий на куче
+    ENGINES = ('simpy', 'numpy', 'heap')
+    METRICS = ('served', 'abandoned', 'total_customers', 'refusal_rate')
+    # Параметры, которые можно изменить в альтернативной конфигурации
+    ALTERNATIVE_PARAMS = ('arrival_rate', 'service_times', 'sim_time', 'service_distribution', 'service_spread')
+
+    def __init__(self, arrival_rate, num_runs=1, engine='simpy', batch_size=500,
+                 workers=1, chunk_size=None, seed=None, keep_history=False, confidence=0.95,
+                 target_precision=None, utilization_precision=None, min_runs=10,
+                 service_times=DEFAULT_SERVICE_TIMES, sim_time=720, service_distribution='fixed',
+                 service_spread=0.5, trace=None, validate=False, antithetic=False, alternative=None,
+                 progress_callback=None, finished_callback=None):
         super().__init__()
+        if engine not in self.ENGINES:
+            raise ValueError(f"неизвестный движок: {engine}")
+        if trace is not None and workers > 1:
+            raise ValueError("трассировка событий доступна только при workers=1")
+        if service_distribution not in SERVICE_DISTRIBUTIONS:
+            raise ValueError(f"неизвестное распределение времени обслуживания: {service_distribution}")
+        if not 0 <= service_spread <= 1:
+            raise ValueError("service_spread должен быть от 0 до 1")
+        if not len(service_times):
+            raise ValueError("нужна хотя бы одна касса")
+        if antithetic and num_runs % 2:
+            raise ValueError("при antithetic число прогонов должно быть четным")
+        if alternative is not None and not set(alternative) <= set(self.ALTERNATIVE_PARAMS):
+            raise ValueError(f"alternative может менять только {', '.join(self.ALTERNATIVE_PARAMS)}")
         self.params = {
             'arrival_rate': arrival_rate,  # скорость прибытия
-            'sim_time': 720,
-            'num_runs': num_runs  # количество прогонов
+            'sim_time': sim_time,
+            'num_runs': num_runs,  # количество прогонов
+            'service_times': tuple(service_times),  # среднее время обслуживания каждой кассы
+            'service_distribution': service_distribution,
+            'service_spread': service_spread
         }
         self.stop_event = threading.Event()
-        self.run_results = []
         self.current_run = 0
         self.progress = 0
 
-        self.random_generator = random.Random()
+        # Статистика копится по мере завершения прогонов, get_results() не пересчитывает ее
+        self.confidence = confidence
+        self.keep_history = keep_history
+        self.history = None  # структурированный массив по прогонам, если keep_history
+        self.metric_stats = RunningStats(len(self.METRICS))
+        self.cashier_served_stats = None
+        self.cashier_utilization_stats = None
+        self._stats_lock = threading.Lock()
+
+        # Адаптивная остановка: прогоны идут, пока относительная полуширина
+        # интервала не станет меньше заданной; num_runs тогда - верхний предел
+        self.target_precision = target_precision  # для refusal_rate
+        self.utilization_precision = utilization_precision  # для загрузки каждой кассы
+        self.min_runs = min_runs
+        self.converged = False
+
+        # seed=None - случайная энтропия; она сохраняется в seed_sequence.entropy,
+        # поэтому любой запуск можно воспроизвести
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        # Каждая репликация берет свой поток по номеру (replication_stream); при
+        # antithetic репликации 2k и 2k+1 делят поток, вторая использует 1 - u
+        self.antithetic = antithetic
+        self._replication = 0  # номер следующей репликации, он же номер для трассы
+        self._pending = None  # первая половина антитетической пары до прихода второй
+        self.uniform = None
+        self.service_uniform = None
+        self._free_cashiers = []  # куча номеров свободных касс процессной модели
         self.cashier_stats = []
 
+        # Сравнение с альтернативной конфигурацией на общих случайных числах:
+        # та же репликация прогоняется с параметрами из alternative, а в
+        # статистику идут разности (см. get_results()['paired_difference'])
+        self.alternative = alternative
+        self._alternative = None
+        if alternative is not None:
+            self.alternative_params = dict(self.params, **alternative)
+            self.alternative_params['service_times'] = tuple(self.alternative_params['service_times'])
+            self._alternative = EnhancedQueueSimulation(
+                num_runs=num_runs, engine=engine, batch_size=batch_size, seed=self.seed_sequence,
+                antithetic=antithetic, **{key: self.alternative_params[key] for key in self.ALTERNATIVE_PARAMS}
+            )
+            self._alternative.stop_event = self.stop_event
+            self.alternative_stats = RunningStats(len(self.METRICS))
+            self.difference_stats = RunningStats(len(self.METRICS))
+
+        self.engine = engine
+        self.batch_size = batch_size  # репликаций за один векторизованный пакет
+        self.workers = workers  # число процессов; 1 - прогоны в этом потоке
+        self.chunk_size = chunk_size  # репликаций в одном задании пула
+
+        # Трассировка событий (EventTrace); None - выключена
+        self.trace = trace if trace is not None and trace.level > TRACE_OFF else None
+
+        # Сверка результатов с аналитической моделью в get_results()
+        self.validate = validate
+        self._analytic = None
+
+        # Вызываются из потока моделирования: после каждой порции прогонов и по окончании
+        self.progress_callback = progress_callback
+        self.finished_callback = finished_callback
+
+    def replication_stream(self, run):
+        """SeedSequence репликации run.
+
+        Поток зависит только от seed и номера репликации, поэтому модели с
+        разными параметрами и одним seed получают общие случайные числа, а
+        результат не зависит от деления прогонов на пачки и процессы.
+        """
+        index = run // 2 if self.antithetic else run
+        return np.random.SeedSequence(self.seed_sequence.entropy,
+                                      spawn_key=self.seed_sequence.spawn_key + (index,))
+
+    def _start_replication(self):
+        """Равномерные генераторы очередной репликации: для прибытий и для времен обслуживания"""
+        stream = self.replication_stream(self._replication)
+        arrival_seed, service_seed = (int(x) for x in stream.generate_state(2))
+        arrival_value = random.Random(arrival_seed).random
+        service_value = random.Random(service_seed).random
+        if self.antithetic and self._replication % 2:
+            self.uniform = lambda: 1.0 - arrival_value()
+            self.service_uniform = lambda: 1.0 - service_value()
+        else:
+            self.uniform = arrival_value
+            self.service_uniform = service_value
+
+    def next_service_factor(self):
+        """Множитель времени обслуживания для очередного клиента"""
+        if self.params['service_distribution'] == 'fixed':
+            return 1.0
+        return service_factor(self.params['service_distribution'], self.service_uniform(),
+                              self.params['service_spread'])
+
     def expovariate(self, lambd=1.0):
         if lambd == 0:
             raise ValueError("lambda должен быть не нулевым")
-        return -math.log(1.0 - self.random_generator.random()) * 1 / lambd
+        return -math.log(1.0 - self.uniform()) * 1 / lambd
 
     def get_arrival_interval(self):
         """Генерация времени между прибытиями клиентов"""
         return self.expovariate(self.params['arrival_rate'])
 
     def customer(self, env, cashiers, customer_id):
-        # Пытаемся найти свободную кассу в порядке от 0 до 3
-        free_cashier = None
-        for cashier in cashiers:
-            if not cashier.busy:
-                free_cashier = cashier
-                break
+        # Множитель времени разыгрывается и для ушедших клиентов, чтобы при общих
+        # случайных числах клиент с тем же номером получал то же число в любой конфигурации
+        factor = self.next_service_factor()
 
-        if free_cashier:
+        # Первая свободная касса в порядке номеров - вершина кучи свободных номеров
+        if self._free_cashiers:
+            free_cashier = cashiers[heapq.heappop(self._free_cashiers)]
             free_cashier.busy = True
 
-            # Используем фиксированное время кассы
-            service_time = free_cashier.service_time
+            service_time = free_cashier.service_time * factor
+            free_cashier.busy_time += min(service_time, self.params['sim_time'] - env.now)
             yield env.timeout(service_time)
 
             free_cashier.busy = False
+            heapq.heappush(self._free_cashiers, free_cashier.id)
             free_cashier.served_count += 1
             self.served_customers += 1
 
-            print(f"Клиент {customer_id} обслужен на {free_cashier}")
+            if self.trace is not None and self.trace.level >= TRACE_ALL:
+                self.trace.record(self._replication, env.now, customer_id, free_cashier.id, SERVED)
         else:
             self.abandoned += 1
 
-            print(f"Клиент {customer_id} ушел - все кассы заняты")
+            if self.trace is not None:
+                self.trace.record(self._replication, env.now, customer_id, -1, ABANDONED)
 
     def setup(self, env, cashiers):
         customer_id = 0
@@ -84,13 +455,23 @@ class EnhancedQueueSimulation(threading.Thread):
             env.process(self.customer(env, cashiers, customer_id))
 
     def run_single_simulation(self):
+        if self.engine == 'numpy':
+            return self.run_batch_simulation(1)[0]
+        if self.engine == 'heap':
+            return self.run_heap_simulation()
+
+        import simpy  # нужен только процессной модели
+
+        self._start_replication()
         env = simpy.Environment()
-        # Создаем 4 кассы с фиксированным временем
-        cashiers = [Cashier(i) for i in range(4)]
+        # Создаем кассы; номера свободных касс хранятся в куче
+        cashiers = [Cashier(i, t) for i, t in enumerate(self.params['service_times'])]
+        self._free_cashiers = list(range(len(cashiers)))
         self.served_customers = 0
         self.abandoned = 0
         env.process(self.setup(env, cashiers))
         env.run(until=self.params['sim_time']) #мэджик
+        self._replication += 1
 
         total_customers = self.served_customers + self.abandoned
         refusal_rate = (self.abandoned / total_customers * 100) if total_customers else 0
@@ -102,7 +483,7 @@ class EnhancedQueueSimulation(threading.Thread):
                 'id': cashier.id,
                 'served_count': cashier.served_count,
                 'service_time': cashier.service_time,
-                'utilization': (cashier.served_count * cashier.service_time) / self.params['sim_time'] * 100
+                'utilization': cashier.busy_time / self.params['sim_time'] * 100
             })
 
         return {
@@ -113,225 +494,694 @@ class EnhancedQueueSimulation(threading.Thread):
             'cashier_stats': self.cashier_stats  # ДОБАВЛЯЕМ СТАТИСТИКУ КАСС
         }
 
-    def run(self):
-        for i in range(self.params['num_runs']):
-            if self.stop_event.is_set():
+    def run_heap_simulation(self):
+        """Прогон одной репликации на собственном ядре дискретных событий.
+
+        Список событий - куча записей (время, вид, касса), в которой не больше
+        одного прибытия и по одному освобождению на кассу; свободные кассы -
+        куча номеров, поэтому выбор первой свободной стоит O(log n) и при
+        сотнях касс. Состояние касс хранится в списках, без объектов Cashier
+        и генераторов на клиента.
+        Случайные числа берутся в том же порядке, что и в процессной модели,
+        поэтому при одинаковом seed результаты совпадают с движком 'simpy'.
+        """
+        arrival_rate = self.params['arrival_rate']
+        if arrival_rate == 0:
+            raise ValueError("lambda должен быть не нулевым")
+        sim_time = self.params['sim_time']
+        service_times = self.params['service_times']
+        num_cashiers = len(service_times)
+
+        free = list(range(num_cashiers))  # куча номеров свободных касс
+        served_counts = [0] * num_cashiers
+        busy_time = [0.0] * num_cashiers
+        abandoned = 0
+        self._start_replication()
+        random_value = self.uniform
+        fixed_service = self.params['service_distribution'] == 'fixed'
+        next_factor = self.next_service_factor
+        log = math.log
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        trace = self.trace
+        trace_run = self._replication
+        trace_served = trace is not None and trace.level >= TRACE_ALL
+        customer_id = 0
+        serving = [0] * num_cashiers  # номер клиента на каждой кассе, нужен только трассе
+
+        events = [(-log(1.0 - random_value()) / arrival_rate, ARRIVAL, -1)]
+        while events:
+            now, kind, cashier = heappop(events)
+            if now >= sim_time:
+                break
+            if kind == DEPARTURE:
+                heappush(free, cashier)
+                served_counts[cashier] += 1
+                if trace_served:
+                    trace.record(trace_run, now, serving[cashier], cashier, SERVED)
+                continue
+
+            customer_id += 1
+            factor = 1.0 if fixed_service else next_factor()
+            # первая свободная касса в порядке номеров
+            if free:
+                cashier = heappop(free)
+                serving[cashier] = customer_id
+                service_time = service_times[cashier] * factor
+                # то же выражение, что в customer(), чтобы загрузка совпадала до бита
+                busy_time[cashier] += min(service_time, sim_time - now)
+                heappush(events, (now + service_time, DEPARTURE, cashier))
+            else:
+                abandoned += 1
+                if trace is not None:
+                    trace.record(trace_run, now, customer_id, -1, ABANDONED)
+            heappush(events, (now - log(1.0 - random_value()) / arrival_rate, ARRIVAL, -1))
+        self._replication += 1
+
+        served = sum(served_counts)
+        total_customers = served + abandoned
+        refusal_rate = (abandoned / total_customers * 100) if total_customers else 0
+        self.cashier_stats = [{
+            'id': i,
+            'served_count': served_counts[i],
+            'service_time': service_times[i],
+            'utilization': busy_time[i] / sim_time * 100
+        } for i in range(num_cashiers)]
+
+        return {
+            'served': served,
+            'abandoned': abandoned,
+            'total_customers': total_customers,
+            'refusal_rate': refusal_rate,
+            'cashier_stats': self.cashier_stats
+        }
+
+    def run_batch_simulation(self, num_runs, block_size=256):
+        """Векторизованный прогон num_runs независимых репликаций.
+
+        Интервалы прибытия разыгрываются блоками сразу для всех репликаций,
+        а выбор кассы делается операциями над массивом моментов освобождения
+        касс (busy_until). Правило то же, что в customer(): первая свободная
+        касса по порядку, иначе клиент уходит; обслуженным считается клиент,
+        закончивший обслуживание до конца моделирования. Записи трассы этого
+        движка идут по номерам клиентов, а не в порядке времени.
+
+        У каждой репликации свой генератор из replication_stream, интервалы
+        получаются обратным преобразованием равномерных чисел, как в 'heap'.
+        Поиск свободной кассы здесь - проход по всем кассам, но он векторизован
+        по репликациям.
+        """
+        arrival_rate = self.params['arrival_rate']
+        if arrival_rate == 0:
+            raise ValueError("lambda должен быть не нулевым")
+        sim_time = self.params['sim_time']
+        service_times = np.array(self.params['service_times'], dtype=float)
+        num_cashiers = len(service_times)
+
+        busy_until = np.zeros((num_runs, num_cashiers))
+        busy_time = np.zeros((num_runs, num_cashiers))
+        served_counts = np.zeros((num_runs, num_cashiers), dtype=np.int64)
+        abandoned = np.zeros(num_runs, dtype=np.int64)
+        last_arrival = np.zeros(num_runs)
+        rows_all = np.arange(num_runs)
+
+        trace = self.trace
+        trace_runs = self._replication + rows_all
+        customer_id = 0
+        streams = [self.replication_stream(run) for run in trace_runs]
+        generators = [np.random.default_rng(stream) for stream in streams]
+        distribution = self.params['service_distribution']
+        if distribution != 'fixed':
+            service_generators = [np.random.default_rng(stream.spawn(1)[0]) for stream in streams]
+        flipped = trace_runs % 2 == 1 if self.antithetic else None
+
+        def draw(generators):
+            uniforms = np.stack([generator.random(block_size) for generator in generators])
+            if flipped is not None:
+                uniforms[flipped] = 1.0 - uniforms[flipped]
+            return uniforms
+
+        while (last_arrival < sim_time).any():
+            gaps = -np.log(1.0 - draw(generators)) / arrival_rate
+            arrivals = last_arrival[:, None] + np.cumsum(gaps, axis=1)
+            last_arrival = arrivals[:, -1]
+            if distribution == 'exponential':
+                factors = -np.log(1.0 - draw(service_generators))
+            elif distribution == 'uniform':
+                factors = 1.0 + self.params['service_spread'] * (2.0 * draw(service_generators) - 1.0)
+
+            for j, t in enumerate(arrivals.T):
+                active = t < sim_time
+                if not active.any():
+                    break
+                customer_id += 1
+                free = busy_until <= t[:, None]
+                first_free = free.argmax(axis=1)
+                has_free = free[rows_all, first_free]
+
+                refused = active & ~has_free
+                abandoned += refused
+                rows = np.flatnonzero(active & has_free)
+                idx = first_free[rows]
+                durations = service_times[idx]
+                if distribution != 'fixed':
+                    durations = durations * factors[rows, j]
+                finish = t[rows] + durations
+                busy_until[rows, idx] = finish
+                busy_time[rows, idx] += np.minimum(finish, sim_time) - t[rows]
+                done = finish < sim_time
+                served_counts[rows[done], idx[done]] += 1
+
+                if trace is not None:
+                    refused_rows = np.flatnonzero(refused)
+                    trace.record_many(trace_runs[refused_rows], t[refused_rows],
+                                      np.full(len(refused_rows), customer_id), np.full(len(refused_rows), -1),
+                                      ABANDONED)
+                    if trace.level >= TRACE_ALL:
+                        trace.record_many(trace_runs[rows[done]], finish[done],
+                                          np.full(done.sum(), customer_id), idx[done], SERVED)
+        self._replication += num_runs
+
+        served = served_counts.sum(axis=1)
+        utilization = busy_time / sim_time * 100
+
+        results = []
+        for r in range(num_runs):
+            total_customers = int(served[r] + abandoned[r])
+            refusal_rate = (abandoned[r] / total_customers * 100) if total_customers else 0
+            cashier_stats = [{
+                'id': i,
+                'served_count': int(served_counts[r, i]),
+                'service_time': self.params['service_times'][i],
+                'utilization': float(utilization[r, i])
+            } for i in range(num_cashiers)]
+            results.append({
+                'served': int(served[r]),
+                'abandoned': int(abandoned[r]),
+                'total_customers': total_customers,
+                'refusal_rate': float(refusal_rate),
+                'cashier_stats': cashier_stats
+            })
+        self.cashier_stats = results[-1]['cashier_stats'] if results else []
+        return results
+
+    def run_chunk(self, num_runs, first_run=None):
+        """Прогон num_runs репликаций подряд выбранным движком, начиная с номера first_run"""
+        if first_run is not None:
+            self._replication = first_run
+        if self.engine == 'numpy':
+            results = []
+            while len(results) < num_runs and not self._cancelled():
+                results.extend(self.run_batch_simulation(min(self.batch_size, num_runs - len(results))))
+            return results
+        results = []
+        for _ in range(num_runs):
+            if self._cancelled():
                 break
-            self.current_run = i + 1
-            result = self.run_single_simulation()
-            self.run_results.append(result)
-            self.progress = (i + 1) / self.params['num_runs'] * 100
+            results.append(self.run_single_simulation())
+        return results
+
+    def _cancelled(self):
+        """stop() или, в процессе пула, отмена всех пачек; проверяется между репликациями"""
+        return self.stop_event.is_set() or (_worker_cancel is not None and _worker_cancel.is_set())
+
+    def run_replications(self, num_runs, first_run=None):
+        """Репликации основной модели и те же репликации альтернативной (или None)"""
+        first_run = self._replication if first_run is None else first_run
+        results = self.run_chunk(num_runs, first_run)
+        if self._alternative is None:
+            return results, None
+        return results, self._alternative.run_chunk(len(results), first_run)
+
+    def _history_dtype(self, num_cashiers):
+        return np.dtype([
+            ('served', np.int32),
+            ('abandoned', np.int32),
+            ('total_customers', np.int32),
+            ('refusal_rate', np.float64),
+            ('cashier_served', np.int32, (num_cashiers,)),
+            ('cashier_utilization', np.float64, (num_cashiers,)),
+        ])
+
+    def _record(self, results, alternative_results=None):
+        """Учет готовых прогонов; при antithetic наблюдением статистики считается среднее пары.
+
+        Точность проверяется после каждого наблюдения: как только она
+        достигнута, остальные прогоны пачки отбрасываются, поэтому
+        runs_needed - точное число понадобившихся прогонов.
+        """
+        with self._stats_lock:
+            for k, result in enumerate(results):
+                if self.converged:
+                    break
+                metrics = np.array([result[m] for m in self.METRICS], dtype=float)
+                served = np.array([c['served_count'] for c in result['cashier_stats']], dtype=float)
+                utilization = np.array([c['utilization'] for c in result['cashier_stats']])
+                if self.cashier_served_stats is None:
+                    self.cashier_served_stats = RunningStats(len(served))
+                    self.cashier_utilization_stats = RunningStats(len(served))
+                    if self.keep_history:
+                        self.history = np.zeros(self.params['num_runs'], dtype=self._history_dtype(len(served)))
+
+                if self.history is not None:
+                    row = self.history[self.current_run]
+                    for m in self.METRICS:
+                        row[m] = result[m]
+                    row['cashier_served'] = served
+                    row['cashier_utilization'] = utilization
+                self.current_run += 1
+
+                sample = (metrics, served, utilization)
+                if alternative_results is not None:
+                    sample += (np.array([alternative_results[k][m] for m in self.METRICS], dtype=float),)
+                if self.antithetic:
+                    if self._pending is None:
+                        self._pending = sample
+                        continue
+                    sample = tuple((a + b) / 2 for a, b in zip(self._pending, sample))
+                    self._pending = None
+
+                self.metric_stats.update(sample[0])
+                self.cashier_served_stats.update(sample[1])
+                self.cashier_utilization_stats.update(sample[2])
+                if alternative_results is not None:
+                    self.alternative_stats.update(sample[3])
+                    self.difference_stats.update(sample[3] - sample[0])
+                self.converged = self.precision_reached()
+            self.progress = 100 if self.converged else self.current_run / self.params['num_runs'] * 100
+        if self.progress_callback is not None:
+            self.progress_callback(self)
+
+    @staticmethod
+    def _within(mean, half_width, precision):
+        return np.all(half_width <= precision * np.abs(mean))
+
+    def precision_reached(self):
+        """Достигнута ли заданная относительная точность средних"""
+        if self.target_precision is None and self.utilization_precision is None:
+            return False
+        if self.metric_stats.count < max(self.min_runs, 2):
+            return False
+        if self.target_precision is not None:
+            i = self.METRICS.index('refusal_rate')
+            half_width = self.metric_stats.half_width(self.confidence)[i]
+            if not self._within(self.metric_stats.mean[i], half_width, self.target_precision):
+                return False
+        if self.utilization_precision is not None:
+            stats = self.cashier_utilization_stats
+            if not self._within(stats.mean, stats.half_width(self.confidence), self.utilization_precision):
+                return False
+        return True
+
+    def run(self):
+        try:
+            if self.workers > 1:
+                self.run_parallel()
+            else:
+                self.run_sequential()
+        finally:
+            if self.finished_callback is not None:
+                self.finished_callback(self)
+
+    def run_sequential(self):
+        num_runs = self.params['num_runs']
+        step = self.batch_size if self.engine == 'numpy' else 1
+        adaptive = self.target_precision is not None or self.utilization_precision is not None
+        while self.current_run < num_runs and not self.converged and not self.stop_event.is_set():
+            size = step
+            if adaptive:
+                # при адаптивной остановке пачки растут от min_runs удвоением, чтобы не считать лишнего
+                size = min(step, max(self.min_runs, self.current_run))
+            self._record(*self.run_replications(min(size, num_runs - self.current_run)))
+        if self.trace is not None:
+            self.trace.flush()
+
+    def run_parallel(self):
+        """Прогон репликаций пачками в пуле процессов.
+
+        Пачка передает процессу seed_sequence и номер первой репликации, а
+        поток каждой репликации выводится из ее номера, поэтому результат не
+        зависит от числа процессов, размера пачек и порядка их завершения.
+        Готовые пачки сразу попадают в статистику. stop() и достижение
+        заданной точности отменяют еще не начатые пачки, а уже идущие
+        останавливаются между репликациями по общему для процессов событию,
+        так что после выхода из run() рабочих процессов не остается.
+        """
+        num_runs = self.params['num_runs']
+        chunk_size = self.chunk_size or max(1, min(50, math.ceil(num_runs / (self.workers * 4))))
+
+        cancel = multiprocessing.Event()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_chunk_worker,
+                                 initargs=(cancel,)) as executor:
+            futures = [
+                executor.submit(_run_chunk_worker, self.params, self.engine, self.batch_size,
+                                min(chunk_size, num_runs - start), self.seed_sequence, start,
+                                self.antithetic, self.alternative)
+                for start in range(0, num_runs, chunk_size)
+            ]
+            # Пачки принимаются в порядке отправки, чтобы история прогонов была воспроизводима
+            for future in futures:
+                while not future.done() and not self.stop_event.is_set():
+                    wait([future], timeout=0.1, return_when=FIRST_COMPLETED)
+                if not self.stop_event.is_set():
+                    self._record(*future.result())
+                if self.stop_event.is_set() or self.converged:
+                    # ожидание короткое: идущие пачки видят cancel после текущей репликации
+                    cancel.set()
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    break
 
     def stop(self):
         self.stop_event.set()
 
     def get_results(self):
-        if not self.run_results:
-            return None
+        with self._stats_lock:
+            if self.metric_stats.count == 0:
+                return None
+
+            means = self.metric_stats.mean.copy()
+            half_widths = self.metric_stats.half_width(self.confidence)
 
-        avg_served = np.mean([r['served'] for r in self.run_results])
-        avg_abandoned = np.mean([r['abandoned'] for r in self.run_results])
-        avg_total = np.mean([r['total_customers'] for r in self.run_results])
-        avg_refusal_rate = np.mean([r['refusal_rate'] for r in self.run_results])
-
-        # расчет статистики касс
-        cashier_stats_all = []
-        if self.run_results and 'cashier_stats' in self.run_results[0]:
-            num_cashiers = len(self.run_results[0]['cashier_stats'])
-            for i in range(num_cashiers):
-                cashier_served = [run['cashier_stats'][i]['served_count'] for run in self.run_results]
-                cashier_utilization = [run['cashier_stats'][i]['utilization'] for run in self.run_results]
+            # статистика касс
+            cashier_stats_all = []
+            served_ci = self.cashier_served_stats.half_width(self.confidence)
+            utilization_ci = self.cashier_utilization_stats.half_width(self.confidence)
+            for i in range(len(self.cashier_served_stats.mean)):
                 cashier_stats_all.append({
                     'id': i,
-                    'avg_served': np.mean(cashier_served),
-                    'avg_utilization': np.mean(cashier_utilization)
+                    'avg_served': self.cashier_served_stats.mean[i],
+                    'avg_utilization': self.cashier_utilization_stats.mean[i],
+                    'ci_served': served_ci[i],
+                    'ci_utilization': utilization_ci[i]
                 })
 
+            results = {
+                'avg_served': means[0],
+                'avg_abandoned': means[1],
+                'avg_total': means[2],
+                'avg_refusal_rate': means[3],
+                # полуширины доверительных интервалов средних
+                'ci': dict(zip(self.METRICS, half_widths)),
+                'confidence': self.confidence,
+                'num_runs': self.params['num_runs'],
+                'current_run': self.current_run,
+                'progress': self.progress,
+                'converged': self.converged,
+                'runs_needed': self.current_run if self.converged else None,
+                'all_results': None if self.history is None else self.history[:self.current_run],
+                'avg_cashier_stats': cashier_stats_all,
+                'antithetic': self.antithetic,
+            }
+            if self._alternative is not None:
+                results['paired_difference'] = self._paired_difference()
+        if self.validate:
+            results['validation'] = self.validate_against_analytic(results)
+        return results
+
+    def _paired_difference(self):
+        """Разности 'альтернатива - основная модель' по общим случайным числам.
+
+        variance_reduction - во сколько раз дисперсия парной разности меньше
+        дисперсии разности независимых прогонов; во столько же раз меньше
+        прогонов нужно для той же точности сравнения.
+        """
+        base, alternative, difference = self.metric_stats, self.alternative_stats, self.difference_stats
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reduction = (base.variance + alternative.variance) / difference.variance
         return {
-            'avg_served': avg_served,
-            'avg_abandoned': avg_abandoned,
-            'avg_total': avg_total,
-            'avg_refusal_rate': avg_refusal_rate,
-            'num_runs': self.params['num_runs'],
-            'current_run': self.current_run,
-            'progress': self.progress,
-            'all_results': self.run_results,
-            'avg_cashier_stats': cashier_stats_all
+            'params': self.alternative_params,
+            'alternative_means': dict(zip(self.METRICS, alternative.mean.copy())),
+            'mean': dict(zip(self.METRICS, difference.mean.copy())),
+            'ci': dict(zip(self.METRICS, difference.half_width(self.confidence))),
+            'variance_reduction': dict(zip(self.METRICS, reduction)),
         }
 
-class MainWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("СМО: Модель магазина")
-        self.setGeometry(100, 100, 1200, 800)
-
-        # Основное размещение
-        central = QWidget()
-        self.setCentralWidget(central)
-        layout = QHBoxLayout(central)
-
-        # Панель управления
-        control_panel = self.create_control_panel()
-        layout.addLayout(control_panel, stretch=1)
-
-        self.figure = plt.figure(figsize=(10, 8))
-        self.canvas = FigureCanvas(self.figure)
-        self.ax_stats = self.figure.add_subplot(211)  # первый график сверху
-        self.ax_cashiers = self.figure.add_subplot(212)  # второй график снизу
-
-        self.ax_stats.set_title("Результаты моделирования")
-        self.ax_cashiers.set_title("Загрузка касс")
-
-        layout.addWidget(self.canvas, stretch=3, alignment=QtCore.Qt.AlignmentFlag.AlignCenter)
-
-        # Таймер обновления
-        self.update_timer = QtCore.QTimer()
-        self.update_timer.timeout.connect(self.update_plots)
-
-    def create_control_panel(self):
-        panel = QVBoxLayout()
-
-        # Параметр
-        params_box = QGroupBox("Параметры")
-        params_layout = QVBoxLayout()
-        self._add_double_spin(params_layout, "Клиентов в минуту:", 0.001, 20.0, 0.5, 'arrival_rate')
-        self._add_spin(params_layout, "Количество прогонов:", 1, 10000, 100, 'num_runs')
-        params_box.setLayout(params_layout)
-        panel.addWidget(params_box)
-
-        # Кнопки
-        self.btn_start = QPushButton("Запустить симуляцию")
-        self.btn_stop = QPushButton("Остановить")
-        panel.addWidget(self.btn_start)
-        panel.addWidget(self.btn_stop)
-
-        # Прогресс
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setVisible(False)
-        panel.addWidget(self.progress_bar)
-
-        # Результаты
-        self.results_label = QLabel("Результаты появятся после симуляции")
-        panel.addWidget(self.results_label)
-        panel.addStretch()
-
-        self.btn_start.clicked.connect(self.start_simulation)
-        self.btn_stop.clicked.connect(self.stop_simulation)
-        return panel
-
-    def _add_spin(self, layout, label, minv, maxv, val, attr):
-        layout.addWidget(QLabel(label))
-        spin = QSpinBox()
-        spin.setRange(minv, maxv)
-        spin.setValue(val)
-        setattr(self, attr + '_spin', spin)
-        layout.addWidget(spin)
-
-    def _add_double_spin(self, layout, label, minv, maxv, val, attr):
-        layout.addWidget(QLabel(label))
-        spin = QDoubleSpinBox()
-        spin.setRange(minv, maxv)
-        spin.setValue(val)
-        spin.setSingleStep(0.1)
-        spin.setDecimals(2)
-        setattr(self, attr + '_spin', spin)
-        layout.addWidget(spin)
-
-    def start_simulation(self):
-        if hasattr(self, 'sim_thread') and self.sim_thread.is_alive():
-            self.sim_thread.stop()
-            self.sim_thread.join()
-
-        params = {
-            'arrival_rate': self.arrival_rate_spin.value(),
-            'num_runs': self.num_runs_spin.value()
+    def analytic_results(self):
+        """Аналитическая оценка для параметров модели (считается один раз)"""
+        if self._analytic is None:
+            self._analytic = analytic_loss_model(self.params['arrival_rate'], self.params['service_times'])
+        return self._analytic
+
+    # Допустимое относительное отклонение от аналитики: Эрланг B точен, кроме
+    # влияния конечного горизонта; CTMC для фиксированных времен - приближение
+    VALIDATION_TOLERANCE = {'erlang-b': 0.05, 'ctmc': 0.25}
+
+    def validate_against_analytic(self, results=None, tolerance=None, absolute_tolerance=0.1):
+        """Сверка средних моделирования с аналитической моделью.
+
+        Отклонение считается допустимым, если оно не больше полуширины
+        доверительного интервала плюс запас: доля tolerance от ожидаемого
+        значения, но не меньше absolute_tolerance процентных пунктов.
+        Грубое приближение 'overflow' не сверяется (consistent = None).
+        """
+        results = results or self.get_results()
+        if results is None:
+            return None
+        analytic = self.analytic_results()
+        if tolerance is None:
+            tolerance = self.VALIDATION_TOLERANCE.get(analytic['method'])
+
+        def check(expected, simulated, half_width):
+            deviation = simulated - expected
+            consistent = None
+            if tolerance is not None:
+                margin = max(tolerance * abs(expected), absolute_tolerance)
+                consistent = bool(abs(deviation) <= half_width + margin)
+            return {
+                'expected': expected,
+                'simulated': float(simulated),
+                'deviation': float(deviation),
+                'consistent': consistent,
+            }
+
+        checks = {'refusal_rate': check(analytic['refusal_rate'], results['avg_refusal_rate'],
+                                        results['ci']['refusal_rate'])}
+        for cashier, expected in zip(results['avg_cashier_stats'], analytic['cashier_utilization']):
+            checks[f"utilization_{cashier['id']}"] = check(expected, cashier['avg_utilization'],
+                                                           cashier['ci_utilization'])
+        return {
+            'method': analytic['method'],
+            'checks': checks,
+            'consistent': None if tolerance is None else all(c['consistent'] for c in checks.values()),
         }
-        self.sim_thread = EnhancedQueueSimulation(**params)
-        self.sim_thread.start()
-        self.progress_bar.setVisible(True)
-        self.progress_bar.setValue(0)
-        self.update_timer.start(500)
-
-    def stop_simulation(self):
-        if hasattr(self, 'sim_thread') and self.sim_thread.is_alive():
-            self.sim_thread.stop()
-            self.sim_thread.join()
-        self.update_timer.stop()
-        self.progress_bar.setVisible(False)
-
-    def update_plots(self):
-        if not self.sim_thread or not self.sim_thread.is_alive():
-            results = self.sim_thread.get_results()
-            if results:
-                self.display_results(results)
-                self.update_plot_data(results)
-            self.progress_bar.setVisible(False)
-            self.update_timer.stop()
-            return
-        self.progress_bar.setValue(int(self.sim_thread.progress))
-
-    def display_results(self, results):
-        text = (
-            f"Прогон: {results['current_run']}/{results['num_runs']}\n"
-            f"Среднее обслужено: {results['avg_served']:.1f}\n"
-            f"Среднее ушло: {results['avg_abandoned']:.1f}\n"
-            f"Отказы: {results['avg_refusal_rate']:.1f}%\n"
-            f"Всего клиентов: {results['avg_total']:.1f}"
-        )
-
-        if 'avg_cashier_stats' in results:
-            text += "\n\n--- Статистика касс ---"
-            for cashier in results['avg_cashier_stats']:
-                text += f"\nКасса {cashier['id'] + 1}: {cashier['avg_served']:.1f} клиентов"
-
-        self.results_label.setText(text)
-
-    def update_plot_data(self, results):
-
-        self.ax_stats.clear()
-        self.ax_cashiers.clear()
-
-        self.ax_stats.set_title("Статистика по прогонам")
-        self.ax_stats.set_xlabel("Прогоны")
-        self.ax_stats.set_ylabel("Количество клиентов")
-
-        runs = list(range(1, len(results['all_results']) + 1))
-        served = [r['served'] for r in results['all_results']]
-        abandoned = [r['abandoned'] for r in results['all_results']]
-        total = [r['total_customers'] for r in results['all_results']]
-
-        self.ax_stats.plot(runs, served, 'g-', label='Обслужено')
-        self.ax_stats.plot(runs, abandoned, 'r-', label='Ушли')
-        self.ax_stats.plot(runs, total, 'b--', label='Всего клиентов')
-        self.ax_stats.legend()
-        self.ax_stats.grid(True, linestyle='--', alpha=0.3)
-
-        self.ax_cashiers.set_title("Загрузка касс")
-        self.ax_cashiers.set_xlabel("Кассы")
-        self.ax_cashiers.set_ylabel("Количество обслуженных клиентов")
-
-        if 'avg_cashier_stats' in results and results['avg_cashier_stats']:
-            cashier_ids = [f"Касса {c['id'] + 1}" for c in results['avg_cashier_stats']]
-            served_counts = [c['avg_served'] for c in results['avg_cashier_stats']]
-
-            bars = self.ax_cashiers.bar(cashier_ids, served_counts, color=['blue', 'green', 'orange', 'red'])
-
-            for bar, count in zip(bars, served_counts):
-                self.ax_cashiers.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.5,
-                                      f'{count:.1f}', ha='center', va='bottom')
-
-        self.ax_cashiers.grid(True, linestyle='--', alpha=0.3)
-
-        self.figure.tight_layout()
-        self.canvas.draw()
-
-
-def main():
-    app = QApplication(sys.argv)
-    window = MainWindow()
-    window.show()
-    sys.exit(app.exec())
+
+
+# Событие отмены пачек процесса пула run_parallel; в основном процессе None
+_worker_cancel = None
+
+
+def _init_chunk_worker(cancel):
+    global _worker_cancel
+    _worker_cancel = cancel
+
+
+def _run_chunk_worker(params, engine, batch_size, num_runs, seed, first_run=0, antithetic=False,
+                      alternative=None):
+    """Задание для процесса пула: num_runs репликаций начиная с first_run"""
+    sim = EnhancedQueueSimulation(engine=engine, batch_size=batch_size, seed=seed, antithetic=antithetic,
+                                  alternative=alternative, **params)
+    return sim.run_replications(num_runs, first_run)
+
+
+def compare_engines(arrival_rate, num_runs=200, engines=('simpy', 'numpy'), seed=None):
+    """Статистическая сверка двух движков на одинаковых параметрах.
+
+    Для каждой метрики и загрузки каждой кассы ('utilization_<id кассы>')
+    возвращает средние по обоим движкам и z-статистику разности средних;
+    |z| < 3 означает согласие движков.
+    """
+    sims = []
+    for engine in engines:
+        sim = EnhancedQueueSimulation(arrival_rate, num_runs, engine=engine, seed=seed)
+        sim.run()
+        sims.append(sim)
+
+    def z_entry(a, b, i):
+        se = math.sqrt(a.variance[i] / a.count + b.variance[i] / b.count)
+        z = (a.mean[i] - b.mean[i]) / se if se > 0 else 0.0
+        return {engines[0]: float(a.mean[i]), engines[1]: float(b.mean[i]), 'z': float(z)}
+
+    comparison = {}
+    a, b = (sim.metric_stats for sim in sims)
+    for metric in ('served', 'abandoned', 'refusal_rate'):
+        comparison[metric] = z_entry(a, b, EnhancedQueueSimulation.METRICS.index(metric))
+    a, b = (sim.cashier_utilization_stats for sim in sims)
+    for i in range(len(a.mean)):
+        comparison[f'utilization_{i}'] = z_entry(a, b, i)
+    return comparison
+
+
+def summarize(sim):
+    """Итоги моделирования в виде, пригодном для JSON"""
+    results = sim.get_results()
+    if results is None:
+        return None
+
+    def plain(value):
+        if isinstance(value, dict):
+            return {k: plain(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [plain(v) for v in value]
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and not math.isfinite(value):
+            return None  # например, интервал по одному прогону
+        return value
+
+    summary = {key: value for key, value in results.items() if key != 'all_results'}
+    summary['params'] = dict(sim.params)
+    summary['engine'] = sim.engine
+    summary['model_version'] = MODEL_VERSION
+    summary['seed_entropy'] = sim.seed_sequence.entropy
+    return plain(summary)
+
+
+def _summary_row(summary):
+    """Плоская строка итогов для табличных форматов"""
+    row = {
+        'arrival_rate': summary['params']['arrival_rate'],
+        'sim_time': summary['params']['sim_time'],
+        'service_times': ' '.join(f'{t:g}' for t in summary['params']['service_times']),
+        'service_distribution': summary['params']['service_distribution'],
+        'engine': summary['engine'],
+        'seed_entropy': summary['seed_entropy'],
+        'runs': summary['current_run'],
+        'converged': summary['converged'],
+        'avg_served': summary['avg_served'],
+        'avg_abandoned': summary['avg_abandoned'],
+        'avg_total': summary['avg_total'],
+        'avg_refusal_rate': summary['avg_refusal_rate'],
+        'ci_refusal_rate': summary['ci']['refusal_rate'],
+    }
+    for cashier in summary['avg_cashier_stats']:
+        row[f"avg_served_{cashier['id'] + 1}"] = cashier['avg_served']
+        row[f"avg_utilization_{cashier['id'] + 1}"] = cashier['avg_utilization']
+    if 'paired_difference' in summary:
+        difference = summary['paired_difference']
+        row['diff_refusal_rate'] = difference['mean']['refusal_rate']
+        row['ci_diff_refusal_rate'] = difference['ci']['refusal_rate']
+        row['variance_reduction'] = difference['variance_reduction']['refusal_rate']
+    return row
+
+
+def write_summary(summary, path, history=None):
+    """Запись итогов в JSON, CSV или Parquet (по расширению файла).
+
+    Для Parquet нужен pyarrow. history - структурированный массив прогонов,
+    для CSV и Parquet он пишется рядом в файл с суффиксом _runs.
+    """
+    base, ext = os.path.splitext(path)
+    ext = ext.lower()
+    if ext == '.json':
+        if history is not None:
+            summary = dict(summary, runs_history={
+                name: history[name].tolist() for name in history.dtype.names
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return
+
+    tables = [(path, [_summary_row(summary)])]
+    if history is not None:
+        rows = []
+        for record in history:
+            row = {name: record[name].item() for name in EnhancedQueueSimulation.METRICS}
+            for i, value in enumerate(record['cashier_served']):
+                row[f'served_{i + 1}'] = int(value)
+            for i, value in enumerate(record['cashier_utilization']):
+                row[f'utilization_{i + 1}'] = float(value)
+            rows.append(row)
+        tables.append((f'{base}_runs{ext}', rows))
+
+    for table_path, rows in tables:
+        if ext == '.csv':
+            with open(table_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        elif ext == '.parquet':
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise RuntimeError("для записи Parquet нужен пакет pyarrow") from None
+            pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), table_path)
+        else:
+            raise ValueError(f"неизвестный формат файла: {path}")
+
+
+def run_cli(argv=None):
+    """Пакетный прогон без GUI: python -m Lab_three --arrival-rate 2 --runs 1000 --out result.json"""
+    parser = argparse.ArgumentParser(prog='python -m Lab_three', description="Пакетное моделирование магазина")
+    parser.add_argument('--arrival-rate', type=float, required=True, help="клиентов в минуту")
+    parser.add_argument('--runs', type=int, default=100, help="число прогонов (предел при --precision)")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--service-times', type=lambda text: tuple(float(t) for t in text.split(',')),
+                        default=DEFAULT_SERVICE_TIMES, help="времена обслуживания касс через запятую")
+    parser.add_argument('--cashiers', type=int,
+                        help="число касс; времена из --service-times повторяются по кругу")
+    parser.add_argument('--service-distribution', choices=SERVICE_DISTRIBUTIONS, default='fixed',
+                        help="распределение времени обслуживания со средним из --service-times")
+    parser.add_argument('--service-spread', type=float, default=0.5,
+                        help="полуширина равномерного распределения в долях среднего")
+    parser.add_argument('--compare-service-times', type=lambda text: tuple(float(t) for t in text.split(',')),
+                        help="сравнить с другими временами касс на общих случайных числах")
+    parser.add_argument('--compare-arrival-rate', type=float,
+                        help="сравнить с другой скоростью прибытия на общих случайных числах")
+    parser.add_argument('--antithetic', action='store_true', help="антитетические пары прогонов")
+    parser.add_argument('--sim-time', type=float, default=720)
+    parser.add_argument('--engine', choices=EnhancedQueueSimulation.ENGINES, default='numpy')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--precision', type=float, help="относительная точность доли отказов")
+    parser.add_argument('--validate', action='store_true', help="сверить с аналитической моделью")
+    parser.add_argument('--history', action='store_true', help="сохранить результаты каждого прогона")
+    parser.add_argument('--out', help="файл .json/.csv/.parquet; по умолчанию JSON в stdout")
+    args = parser.parse_args(argv)
+    if args.out and os.path.splitext(args.out)[1].lower() not in ('.json', '.csv', '.parquet'):
+        parser.error("файл результатов должен быть .json, .csv или .parquet")
+    if args.antithetic and args.runs % 2:
+        parser.error("при --antithetic число прогонов должно быть четным")
+    service_times = args.service_times
+    if args.cashiers is not None:
+        if args.cashiers < 1:
+            parser.error("нужна хотя бы одна касса")
+        service_times = tuple(itertools.islice(itertools.cycle(service_times), args.cashiers))
+    alternative = {}
+    if args.compare_service_times:
+        alternative['service_times'] = args.compare_service_times
+    if args.compare_arrival_rate is not None:
+        alternative['arrival_rate'] = args.compare_arrival_rate
+
+    sim = EnhancedQueueSimulation(
+        args.arrival_rate, args.runs, engine=args.engine, workers=args.workers, seed=args.seed,
+        keep_history=args.history, target_precision=args.precision, service_times=service_times,
+        sim_time=args.sim_time, service_distribution=args.service_distribution,
+        service_spread=args.service_spread, validate=args.validate, antithetic=args.antithetic,
+        alternative=alternative or None
+    )
+    sim.run()
+    summary = summarize(sim)
+    history = sim.get_results()['all_results'] if args.history else None
+    if args.out:
+        try:
+            write_summary(summary, args.out, history)
+        except RuntimeError as error:
+            parser.exit(1, f"{error}\n")
+    else:
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        # без аргументов открывается окно; Qt и matplotlib загружаются только здесь
+        from Lab_three_gui import main as gui_main
+        gui_main()
+        return
+    run_cli(argv)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
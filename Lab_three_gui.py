@@ -0,0 +1,299 @@
+"""Окно модели магазина (PySide6 + matplotlib).
+
+Модель находится в Lab_three и от Qt не зависит; запуск окна:
+    python Lab_three_gui.py
+"""
+import sys
+import time
+
+import numpy as np
+from PySide6 import QtCore, QtWidgets
+from PySide6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+    QLabel, QSpinBox, QPushButton, QGroupBox, QDoubleSpinBox, QProgressBar
+)
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+import matplotlib.pyplot as plt
+
+from Lab_three import DEFAULT_SERVICE_TIMES, EnhancedQueueSimulation
+
+
+def downsample_minmax(values, width):
+    """Прореживание ряда до width интервалов с сохранением минимума и максимума каждого.
+
+    Возвращает номера прогонов (с 1) и значения; короткие ряды не меняются.
+    """
+    n = len(values)
+    if n <= 2 * width:
+        return np.arange(1, n + 1), values
+    starts = np.linspace(0, n, width + 1).astype(int)[:-1]
+    mins = np.minimum.reduceat(values, starts)
+    maxs = np.maximum.reduceat(values, starts)
+    return np.repeat(starts + 1, 2), np.column_stack([mins, maxs]).ravel()
+
+
+class SimulationSignals(QtCore.QObject):
+    """Мост от потока моделирования к GUI.
+
+    Колбэки модели вызываются в ее потоке, а сигналы доставляются в поток
+    Qt через очередь событий. Прогресс отправляется не чаще min_interval.
+    """
+    progress = QtCore.Signal(object)
+    finished = QtCore.Signal(object)
+
+    def __init__(self, min_interval=0.1):
+        super().__init__()
+        self.min_interval = min_interval
+        self._last_emit = 0.0
+
+    def notify_progress(self, sim):
+        now = time.monotonic()
+        if now - self._last_emit >= self.min_interval:
+            self._last_emit = now
+            self.progress.emit(sim)
+
+    def notify_finished(self, sim):
+        self.finished.emit(sim)
+
+
+class MainWindow(QMainWindow):
+    CASHIER_COLORS = ['blue', 'green', 'orange', 'red']
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("СМО: Модель магазина")
+        self.setGeometry(100, 100, 1200, 800)
+
+        # Основное размещение
+        central = QWidget()
+        self.setCentralWidget(central)
+        layout = QHBoxLayout(central)
+
+        # Панель управления
+        control_panel = self.create_control_panel()
+        layout.addLayout(control_panel, stretch=1)
+
+        self.figure = plt.figure(figsize=(10, 8))
+        self.canvas = FigureCanvas(self.figure)
+        self.ax_stats = self.figure.add_subplot(211)  # первый график сверху
+        self.ax_cashiers = self.figure.add_subplot(212)  # второй график снизу
+        self.setup_plots()
+
+        layout.addWidget(self.canvas, stretch=3, alignment=QtCore.Qt.AlignmentFlag.AlignCenter)
+
+        # Сигналы от потока моделирования
+        self.sim_thread = None
+        self.signals = SimulationSignals()
+        self.signals.progress.connect(self.update_plots)
+        self.signals.finished.connect(self.simulation_finished)
+
+    def setup_plots(self):
+        """Оси и художники создаются один раз, дальше меняются только их данные"""
+        self.ax_stats.set_title("Статистика по прогонам")
+        self.ax_stats.set_xlabel("Прогоны")
+        self.ax_stats.set_ylabel("Количество клиентов")
+        self.ax_stats.grid(True, linestyle='--', alpha=0.3)
+        self.stat_lines = {
+            'served': self.ax_stats.plot([], [], 'g-', label='Обслужено', animated=True)[0],
+            'abandoned': self.ax_stats.plot([], [], 'r-', label='Ушли', animated=True)[0],
+            'total_customers': self.ax_stats.plot([], [], 'b--', label='Всего клиентов', animated=True)[0],
+        }
+        self.ax_stats.legend(loc='lower center', ncol=3)
+
+        self.ax_cashiers.set_title("Загрузка касс")
+        self.ax_cashiers.set_xlabel("Кассы")
+        self.ax_cashiers.set_ylabel("Количество обслуженных клиентов")
+        self.ax_cashiers.grid(True, linestyle='--', alpha=0.3)
+        cashier_ids = [f"Касса {i + 1}" for i in range(len(DEFAULT_SERVICE_TIMES))]
+        colors = [self.CASHIER_COLORS[i % len(self.CASHIER_COLORS)] for i in range(len(cashier_ids))]
+        self.cashier_bars = self.ax_cashiers.bar(cashier_ids, [0] * len(cashier_ids), color=colors)
+        self.cashier_labels = []
+        for bar in self.cashier_bars:
+            bar.set_animated(True)
+            self.cashier_labels.append(self.ax_cashiers.text(bar.get_x() + bar.get_width() / 2, 0, '',
+                                                             ha='center', va='bottom', animated=True))
+
+        self.figure.tight_layout()
+        self._background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _animated_artists(self):
+        return [*self.stat_lines.values(), *self.cashier_bars, *self.cashier_labels]
+
+    def _on_draw(self, event):
+        # после полной перерисовки запоминаем фон и дорисовываем изменяемые элементы
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for artist in self._animated_artists():
+            artist.axes.draw_artist(artist)
+
+    def create_control_panel(self):
+        panel = QVBoxLayout()
+
+        # Параметр
+        params_box = QGroupBox("Параметры")
+        params_layout = QVBoxLayout()
+        self._add_double_spin(params_layout, "Клиентов в минуту:", 0.001, 20.0, 0.5, 'arrival_rate')
+        self._add_spin(params_layout, "Количество прогонов:", 1, 10000, 100, 'num_runs')
+        self._add_double_spin(params_layout, "Точность отказов, % (0 - выкл):", 0.0, 50.0, 0.0, 'target_precision')
+        params_box.setLayout(params_layout)
+        panel.addWidget(params_box)
+
+        # Кнопки
+        self.btn_start = QPushButton("Запустить симуляцию")
+        self.btn_stop = QPushButton("Остановить")
+        panel.addWidget(self.btn_start)
+        panel.addWidget(self.btn_stop)
+
+        # Прогресс
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        panel.addWidget(self.progress_bar)
+
+        # Результаты
+        self.results_label = QLabel("Результаты появятся после симуляции")
+        panel.addWidget(self.results_label)
+        panel.addStretch()
+
+        self.btn_start.clicked.connect(self.start_simulation)
+        self.btn_stop.clicked.connect(self.stop_simulation)
+        return panel
+
+    def _add_spin(self, layout, label, minv, maxv, val, attr):
+        layout.addWidget(QLabel(label))
+        spin = QSpinBox()
+        spin.setRange(minv, maxv)
+        spin.setValue(val)
+        setattr(self, attr + '_spin', spin)
+        layout.addWidget(spin)
+
+    def _add_double_spin(self, layout, label, minv, maxv, val, attr):
+        layout.addWidget(QLabel(label))
+        spin = QDoubleSpinBox()
+        spin.setRange(minv, maxv)
+        spin.setValue(val)
+        spin.setSingleStep(0.1)
+        spin.setDecimals(2)
+        setattr(self, attr + '_spin', spin)
+        layout.addWidget(spin)
+
+    def start_simulation(self):
+        # предыдущий прогон только получает команду остановиться - его сигналы дальше игнорируются
+        if self.sim_thread is not None and self.sim_thread.is_alive():
+            self.sim_thread.stop()
+
+        params = {
+            'arrival_rate': self.arrival_rate_spin.value(),
+            'num_runs': self.num_runs_spin.value(),
+            'keep_history': True,
+            'target_precision': self.target_precision_spin.value() / 100 or None,
+            'progress_callback': self.signals.notify_progress,
+            'finished_callback': self.signals.notify_finished
+        }
+        self.reset_plots(params['num_runs'])
+        self.sim_thread = EnhancedQueueSimulation(**params)
+        self.sim_thread.start()
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+
+    def stop_simulation(self):
+        # без join(): поток завершит текущую порцию и пришлет finished
+        if self.sim_thread is not None and self.sim_thread.is_alive():
+            self.sim_thread.stop()
+
+    def closeEvent(self, event):
+        self.stop_simulation()
+        super().closeEvent(event)
+
+    def update_plots(self, sim):
+        if sim is not self.sim_thread:
+            return
+        self.progress_bar.setValue(int(sim.progress))
+        results = sim.get_results()
+        if results:
+            self.display_results(results)
+            self.update_plot_data(results)
+
+    def simulation_finished(self, sim):
+        if sim is not self.sim_thread:
+            return
+        results = sim.get_results()
+        if results:
+            self.display_results(results)
+            self.update_plot_data(results)
+        self.progress_bar.setVisible(False)
+
+    def display_results(self, results):
+        text = (
+            f"Прогон: {results['current_run']}/{results['num_runs']}\n"
+            f"Среднее обслужено: {results['avg_served']:.1f}\n"
+            f"Среднее ушло: {results['avg_abandoned']:.1f}\n"
+            f"Отказы: {results['avg_refusal_rate']:.1f} ± {results['ci']['refusal_rate']:.1f}%\n"
+            f"Всего клиентов: {results['avg_total']:.1f}"
+        )
+        if results['converged']:
+            text += f"\nТочность достигнута за {results['runs_needed']} прогонов"
+
+        if 'avg_cashier_stats' in results:
+            text += "\n\n--- Статистика касс ---"
+            for cashier in results['avg_cashier_stats']:
+                text += f"\nКасса {cashier['id'] + 1}: {cashier['avg_served']:.1f} клиентов"
+
+        self.results_label.setText(text)
+
+    def reset_plots(self, num_runs):
+        for line in self.stat_lines.values():
+            line.set_data([], [])
+        for bar, label in zip(self.cashier_bars, self.cashier_labels):
+            bar.set_height(0)
+            label.set_text('')
+        self.ax_stats.set_xlim(1, max(num_runs, 2))
+        self.ax_stats.set_ylim(0, 1)
+        self.ax_cashiers.set_ylim(0, 1)
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
+
+    @staticmethod
+    def _grow_ylim(ax, top):
+        # пределы растут с запасом, чтобы полная перерисовка была редкой
+        if top > ax.get_ylim()[1]:
+            ax.set_ylim(0, top * 1.25)
+            return True
+        return False
+
+    def update_plot_data(self, results):
+        """Обновление данных существующих линий и столбцов с перерисовкой через blit"""
+        limits_changed = False
+
+        history = results['all_results']
+        if history is not None and len(history):
+            width = max(int(self.ax_stats.bbox.width), 1)
+            for field, line in self.stat_lines.items():
+                line.set_data(*downsample_minmax(history[field], width))
+            limits_changed |= self._grow_ylim(self.ax_stats, history['total_customers'].max())
+
+        served_counts = [c['avg_served'] for c in results['avg_cashier_stats']]
+        for bar, label, count in zip(self.cashier_bars, self.cashier_labels, served_counts):
+            bar.set_height(count)
+            label.set_y(count)
+            label.set_text(f'{count:.1f}')
+        if served_counts:
+            limits_changed |= self._grow_ylim(self.ax_cashiers, max(served_counts))
+
+        if limits_changed or self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        for artist in self._animated_artists():
+            artist.axes.draw_artist(artist)
+        self.canvas.blit(self.figure.bbox)
+
+
+def main():
+    app = QApplication(sys.argv)
+    window = MainWindow()
+    window.show()
+    sys.exit(app.exec())
+
+
+if __name__ == "__main__":
+    main()
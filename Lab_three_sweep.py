@@ -0,0 +1,285 @@
+"""Перебор параметров модели магазина без GUI.
+
+Каждая точка (скорость прибытия, времена обслуживания касс) моделируется
+через EnhancedQueueSimulation и сохраняется в дисковый кэш по ключу из всех
+параметров и seed, поэтому повторный перебор считает только новые точки.
+
+Пример:
+    python -m Lab_three_sweep --range 0.5 5 0.5 --service-times 3,4,5,6 --out curve.csv
+    python -m Lab_three_sweep --threshold 20 --low 0.1 --high 5
+    python -m Lab_three_sweep --analytic --range 0.1 20 0.1 --service-times 3,4,5,6
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Lab_three import (DEFAULT_SERVICE_TIMES, MODEL_VERSION, SERVICE_DISTRIBUTIONS, EnhancedQueueSimulation,
+                        analytic_loss_model)
+
+
+class SweepCache:
+    """Кэш результатов точек: по одному JSON-файлу на ключ параметров"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(point):
+        text = json.dumps(point, sort_keys=True)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, point):
+        return os.path.join(self.directory, self.key(point) + '.json')
+
+    def get(self, point):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(point), encoding='utf-8') as f:
+                return json.load(f)['result']
+        except FileNotFoundError:
+            return None
+
+    def put(self, point, result):
+        if not self.directory:
+            return
+        # запись через временный файл, чтобы прерванный перебор не оставил битый кэш
+        path = self._path(point)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'point': point, 'result': result}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def make_point(arrival_rate, service_times=DEFAULT_SERVICE_TIMES, num_runs=1000, seed=0,
+               sim_time=720, engine='numpy', target_precision=None, service_distribution='fixed',
+               service_spread=0.5):
+    """Описание точки перебора - все, от чего зависит результат.
+
+    Вещественные параметры округляются, чтобы одна и та же точка из разных
+    сеток (0.1 * 3 и 0.3) давала один ключ кэша.
+    """
+    return {
+        # записи кэша от прежних версий модели не совпадут по ключу
+        'model_version': MODEL_VERSION,
+        'arrival_rate': _key_float(arrival_rate),
+        'service_times': [_key_float(t) for t in service_times],
+        'num_runs': int(num_runs),
+        'seed': int(seed),
+        'sim_time': _key_float(sim_time),
+        'engine': engine,
+        'target_precision': target_precision,
+        'service_distribution': service_distribution,
+        'service_spread': _key_float(service_spread),
+    }
+
+
+def _key_float(value):
+    return round(float(value), 10)
+
+
+def evaluate_point(point):
+    """Моделирование одной точки; результат пригоден для JSON"""
+    # seed точки выводится из ее параметров, чтобы точка не зависела от состава перебора
+    point_seed = int(SweepCache.key(point)[:16], 16)
+    sim = EnhancedQueueSimulation(
+        point['arrival_rate'], point['num_runs'], engine=point['engine'],
+        seed=[point['seed'], point_seed], service_times=point['service_times'],
+        sim_time=point['sim_time'], target_precision=point['target_precision'],
+        service_distribution=point['service_distribution'], service_spread=point['service_spread']
+    )
+    sim.run()
+    results = sim.get_results()
+    return {
+        'arrival_rate': point['arrival_rate'],
+        'service_times': point['service_times'],
+        'refusal_rate': float(results['avg_refusal_rate']),
+        'refusal_ci': float(results['ci']['refusal_rate']),
+        'utilization': [float(c['avg_utilization']) for c in results['avg_cashier_stats']],
+        'utilization_ci': [float(c['ci_utilization']) for c in results['avg_cashier_stats']],
+        'runs': results['current_run'],
+    }
+
+
+def evaluate_points(points, cache, workers=1):
+    """Результаты для списка точек: из кэша или параллельным моделированием недостающих"""
+    results = [cache.get(point) for point in points]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        if workers > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                computed = executor.map(evaluate_point, [points[i] for i in missing])
+                for i, result in zip(missing, computed):
+                    cache.put(points[i], result)
+                    results[i] = result
+        else:
+            for i in missing:
+                results[i] = evaluate_point(points[i])
+                cache.put(points[i], results[i])
+    return results
+
+
+def screen_point(arrival_rate, service_times=DEFAULT_SERVICE_TIMES):
+    """Аналитическая оценка точки в том же формате, что и результат моделирования"""
+    analytic = analytic_loss_model(arrival_rate, service_times)
+    return {
+        'arrival_rate': float(arrival_rate),
+        'service_times': [float(t) for t in service_times],
+        'refusal_rate': analytic['refusal_rate'],
+        'refusal_ci': 0.0,
+        'utilization': analytic['cashier_utilization'],
+        'utilization_ci': [0.0] * len(service_times),
+        'runs': 0,
+        'method': analytic['method'],
+    }
+
+
+def screen(arrival_rates, service_time_sets=(DEFAULT_SERVICE_TIMES,)):
+    """Быстрый аналитический перебор для отбора точек, которые стоит моделировать"""
+    return [screen_point(rate, service_times) for service_times in service_time_sets for rate in arrival_rates]
+
+
+def sweep(arrival_rates, service_time_sets=(DEFAULT_SERVICE_TIMES,), cache_dir=None, workers=1, **point_params):
+    """Перебор по сетке скоростей прибытия для каждого набора времен обслуживания"""
+    points = [make_point(rate, service_times, **point_params)
+              for service_times in service_time_sets for rate in arrival_rates]
+    return evaluate_points(points, SweepCache(cache_dir), workers)
+
+
+def find_threshold(threshold, low, high, service_times=DEFAULT_SERVICE_TIMES, tolerance=0.01,
+                   cache_dir=None, workers=1, analytic=False, **point_params):
+    """Скорость прибытия, при которой доля отказов (%) пересекает threshold.
+
+    Доля отказов растет со скоростью прибытия, поэтому интервал [low, high]
+    сужается делением на workers + 1 частей: внутренние точки каждого шага
+    считаются параллельно. С analytic=True точки оцениваются аналитически.
+    Возвращает найденную скорость и все посчитанные точки.
+
+    ValueError, если threshold не лежит между долями отказов на концах
+    интервала или если из-за шума оценок доля отказов оказалась
+    немонотонной (тогда нужно больше прогонов или меньше target_precision).
+    """
+    cache = SweepCache(cache_dir)
+    evaluated = {}
+
+    def evaluate(rates):
+        if analytic:
+            results = [screen_point(rate, service_times) for rate in rates]
+        else:
+            points = [make_point(rate, service_times, **point_params) for rate in rates]
+            results = evaluate_points(points, cache, workers)
+        evaluated.update(zip(rates, results))
+
+    evaluate([low, high])
+    if not evaluated[low]['refusal_rate'] < threshold <= evaluated[high]['refusal_rate']:
+        raise ValueError(f"порог {threshold}% не лежит между долями отказов "
+                         f"{evaluated[low]['refusal_rate']:.3f}% и {evaluated[high]['refusal_rate']:.3f}% "
+                         f"на концах интервала [{low}, {high}]")
+    parts = max(workers, 1) + 1
+    while high - low > tolerance:
+        rates = list(np.linspace(low, high, parts + 1)[1:-1])
+        evaluate(rates)
+        below = [rate for rate in rates if evaluated[rate]['refusal_rate'] < threshold]
+        above = [rate for rate in rates if evaluated[rate]['refusal_rate'] >= threshold]
+        if below and above and max(below) > min(above):
+            raise ValueError(f"доля отказов немонотонна между {min(above):.4f} и {max(below):.4f}: "
+                             "шум оценок больше шага поиска")
+        if below:
+            low = max(below)
+        if above:
+            high = min(above)
+    curve = [evaluated[rate] for rate in sorted(evaluated)]
+    return (low + high) / 2, curve
+
+
+def write_curve(results, path):
+    """Кривая отказов и загрузки касс в CSV (или JSON по расширению файла)"""
+    if path.endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        return
+    num_cashiers = max(len(r['utilization']) for r in results)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['arrival_rate', 'service_times', 'refusal_rate', 'refusal_ci', 'runs']
+                        + [f'utilization_{i + 1}' for i in range(num_cashiers)])
+        for r in results:
+            writer.writerow([r['arrival_rate'], ' '.join(f'{t:g}' for t in r['service_times']),
+                             r['refusal_rate'], r['refusal_ci'], r['runs']] + r['utilization'])
+
+
+def parse_service_times(text):
+    return tuple(float(t) for t in text.split(','))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перебор скорости прибытия для модели магазина")
+    rates = parser.add_mutually_exclusive_group()
+    rates.add_argument('--rates', type=float, nargs='+', help="список скоростей прибытия")
+    rates.add_argument('--range', type=float, nargs=3, metavar=('START', 'STOP', 'STEP'),
+                       help="сетка скоростей прибытия [START, STOP] с шагом STEP")
+    parser.add_argument('--threshold', type=float,
+                        help="найти скорость, при которой доля отказов (%%) пересекает порог")
+    parser.add_argument('--low', type=float, default=0.01)
+    parser.add_argument('--high', type=float, default=20.0)
+    parser.add_argument('--tolerance', type=float, default=0.01)
+    parser.add_argument('--analytic', action='store_true', help="аналитическая оценка без моделирования")
+    parser.add_argument('--service-times', type=parse_service_times, action='append',
+                        help="времена обслуживания касс через запятую; можно повторять")
+    parser.add_argument('--service-distribution', choices=SERVICE_DISTRIBUTIONS, default='fixed',
+                        help="распределение времени обслуживания со средним из --service-times")
+    parser.add_argument('--service-spread', type=float, default=0.5)
+    parser.add_argument('--runs', type=int, default=1000, help="прогонов на точку (предел при --precision)")
+    parser.add_argument('--precision', type=float, help="относительная точность доли отказов")
+    parser.add_argument('--sim-time', type=float, default=720)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=EnhancedQueueSimulation.ENGINES, default='numpy')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--cache', default='.sweep_cache', help="каталог кэша ('' - без кэша)")
+    parser.add_argument('--out', help="файл CSV/JSON для кривой")
+    args = parser.parse_args(argv)
+
+    service_time_sets = args.service_times or [DEFAULT_SERVICE_TIMES]
+    point_params = dict(num_runs=args.runs, seed=args.seed, sim_time=args.sim_time,
+                        engine=args.engine, target_precision=args.precision,
+                        service_distribution=args.service_distribution, service_spread=args.service_spread)
+
+    if args.threshold is not None:
+        results = []
+        for service_times in service_time_sets:
+            rate, curve = find_threshold(args.threshold, args.low, args.high, service_times, args.tolerance,
+                                         cache_dir=args.cache, workers=args.workers, analytic=args.analytic,
+                                         **point_params)
+            print(f"{','.join(f'{t:g}' for t in service_times)}: порог {args.threshold}% при скорости {rate:.4f}")
+            results.extend(curve)
+    else:
+        if args.range:
+            start, stop, step = args.range
+            arrival_rates = (start + step * np.arange(int(round((stop - start) / step)) + 1)).round(10)
+        elif args.rates:
+            arrival_rates = args.rates
+        else:
+            parser.error("нужно указать --rates, --range или --threshold")
+        if args.analytic:
+            results = screen(arrival_rates, service_time_sets)
+        else:
+            results = sweep(arrival_rates, service_time_sets, cache_dir=args.cache, workers=args.workers,
+                            **point_params)
+        for r in results:
+            utilization = ' '.join(f'{u:.1f}' for u in r['utilization'])
+            print(f"{r['arrival_rate']:.3f}: отказы {r['refusal_rate']:.2f} ± {r['refusal_ci']:.2f}%, "
+                  f"загрузка {utilization}")
+
+    if args.out:
+        write_curve(results, args.out)
+
+
+if __name__ == "__main__":
+    main()
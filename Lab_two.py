@@ -1,3 +1,6 @@
+from bisect import bisect_right
+from itertools import accumulate
+
 import numpy as np
 
 
@@ -33,19 +36,206 @@ class StateMachine:
             ('Сломан', 'ошибочный')
         ]
 
-    def get_transition(self, current_state, input_signal, random_value):
-        # Получаем вероятности для текущей комбинации
-        probs = self.prob_matrix[(input_signal, current_state)]
+        self.compile_tables()
+
+    def compile_tables(self):
+        """Кумулятивные вероятности и исходы по целочисленным кодам.
+
+        Коды - индексы в state_names, input_names и output_names. Таблицы
+        нужно пересобрать, если prob_matrix или outcomes изменены после создания.
+        """
+        self.state_names = list(self.states.values())
+        self.input_names = list(self.inputs.values())
+        self.output_names = list(self.outputs.values())
 
-        # Создаем кумулятивные вероятности
-        cum_probs = np.cumsum(probs)
+        # для одиночных шагов - списки Python: на 4 элементах они быстрее NumPy
+        self.cum_probs = {key: list(accumulate(probs)) for key, probs in self.prob_matrix.items()}
+
+        # [вход, состояние, исход] -> кумулятивная вероятность
+        self.cum_table = np.array([
+            [self.cum_probs[(input_signal, state)] for state in self.state_names]
+            for input_signal in self.input_names
+        ])
+        self.outcome_state = np.array([self.state_names.index(state) for state, _ in self.outcomes], dtype=np.int8)
+        self.outcome_output = np.array([self.output_names.index(output) for _, output in self.outcomes],
+                                       dtype=np.int8)
+        # [вход, состояние, исход] -> вероятность исхода
+        self.prob_table = np.array([
+            [self.prob_matrix[(input_signal, state)] for state in self.state_names]
+            for input_signal in self.input_names
+        ], dtype=float)
+
+    def get_transition(self, current_state, input_signal, random_value):
+        # Кумулятивные вероятности для текущей комбинации посчитаны заранее
+        cum_probs = self.cum_probs[(input_signal, current_state)]
 
-        # Находим индекс исхода по случайному числу (векторизовано)
-        outcome_idx = np.searchsorted(cum_probs, random_value, side='right')
+        # Находим индекс исхода по случайному числу
+        outcome_idx = bisect_right(cum_probs, random_value)
 
         # Возвращаем соответствующий исход
         return self.outcomes[outcome_idx]
 
+    def _advance(self, state_codes, input_codes, random_values):
+        """Один шаг для массива автоматов; то же правило выбора исхода, что в get_transition"""
+        outcome = np.zeros(len(state_codes), dtype=np.uint8)
+        if np.ndim(input_codes) == 0:
+            # вход общий для всех: пороги берутся по состоянию из короткого вектора
+            thresholds = self.cum_table[input_codes]
+            for k in range(len(self.outcomes) - 1):
+                outcome += random_values >= thresholds[:, k].take(state_codes)
+        else:
+            thresholds = self.cum_table[input_codes, state_codes]
+            for k in range(len(self.outcomes) - 1):
+                outcome += random_values >= thresholds[:, k]
+        return self.outcome_state.take(outcome), self.outcome_output.take(outcome)
+
+    def _input_rows(self, inputs, num_steps):
+        """Коды входов: одно число, по одному на шаг (T,) или на шаг и автомат (T, N)"""
+        inputs = np.asarray(inputs, dtype=np.intp)
+        if inputs.ndim == 0:
+            inputs = np.full(num_steps, inputs)
+        if len(inputs) != num_steps:
+            raise ValueError("число входных сигналов не совпадает с числом шагов")
+        return inputs
+
+    def simulate_batch(self, num_machines, num_steps, inputs=0, seed=None, initial_state='Исправен',
+                       random_values=None):
+        """Моделирование num_machines независимых автоматов на num_steps шагов.
+
+        Все случайные числа берутся одной матрицей (num_steps, num_machines)
+        (или передаются в random_values). Возвращает массивы кодов состояний
+        после каждого шага и выходных сигналов, оба формы (num_steps, num_machines).
+        """
+        inputs = self._input_rows(inputs, num_steps)
+        if random_values is None:
+            random_values = np.random.default_rng(seed).random((num_steps, num_machines))
+        states = np.empty((num_steps, num_machines), dtype=np.int8)
+        outputs = np.empty((num_steps, num_machines), dtype=np.int8)
+        z = np.full(num_machines, self.state_names.index(initial_state), dtype=np.int8)
+        for t in range(num_steps):
+            z, outputs[t] = self._advance(z, inputs[t], random_values[t])
+            states[t] = z
+        return states, outputs
+
+    def estimate_failures(self, num_machines, num_steps, inputs=0, seed=None, initial_state='Исправен',
+                          max_chunk=1 << 23):
+        """Оценки отказов по ансамблю без хранения траекторий.
+
+        Случайные числа разыгрываются кусками не больше max_chunk значений.
+        Возвращает долю сломанных после каждого шага, долю ошибочных выходов,
+        вероятность хотя бы одной поломки за num_steps шагов и среднее время
+        до первой поломки среди сломавшихся.
+        """
+        inputs = self._input_rows(inputs, num_steps)
+        rng = np.random.default_rng(seed)
+        broken_code = self.state_names.index('Сломан')
+        error_code = self.output_names.index('ошибочный')
+
+        z = np.full(num_machines, self.state_names.index(initial_state), dtype=np.int8)
+        broken_fraction = np.empty(num_steps)
+        first_failure = np.full(num_machines, -1, dtype=np.int64)
+        errors = 0
+        chunk_steps = max(1, max_chunk // max(num_machines, 1))
+        for start in range(0, num_steps, chunk_steps):
+            random_values = rng.random((min(chunk_steps, num_steps - start), num_machines))
+            for offset, row in enumerate(random_values):
+                t = start + offset
+                z, outputs = self._advance(z, inputs[t], row)
+                broken = z == broken_code
+                broken_fraction[t] = broken.mean()
+                errors += np.count_nonzero(outputs == error_code)
+                first_failure[broken & (first_failure < 0)] = t + 1
+
+        failed = first_failure > 0
+        return {
+            'broken_fraction': broken_fraction,
+            'error_rate': errors / (num_machines * num_steps),
+            'failure_probability': failed.mean(),
+            'mean_time_to_failure': first_failure[failed].mean() if failed.any() else None,
+        }
+
+    def _input_weights(self, inputs):
+        """Распределение входных сигналов: имя сигнала, его код, словарь {имя: вес} или веса по кодам"""
+        if inputs is None:
+            weights = np.ones(len(self.input_names))
+        elif isinstance(inputs, str):
+            if inputs not in self.input_names:
+                raise ValueError(f"неизвестный входной сигнал: {inputs}")
+            weights = np.zeros(len(self.input_names))
+            weights[self.input_names.index(inputs)] = 1.0
+        elif isinstance(inputs, dict):
+            weights = np.zeros(len(self.input_names))
+            for name, weight in inputs.items():
+                if name not in self.input_names:
+                    raise ValueError(f"неизвестный входной сигнал: {name}")
+                weights[self.input_names.index(name)] = weight
+        elif np.ndim(inputs) == 0:
+            weights = np.zeros(len(self.input_names))
+            weights[int(inputs)] = 1.0
+        else:
+            weights = np.asarray(inputs, dtype=float)
+            if weights.shape != (len(self.input_names),):
+                raise ValueError(f"нужно {len(self.input_names)} весов входных сигналов")
+        if (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("веса входных сигналов должны быть неотрицательными и не все нулевыми")
+        return weights / weights.sum()
+
+    def outcome_probabilities(self, inputs=None):
+        """Вероятности исходов [состояние, исход] для входа или смеси входов (None - равновероятные)"""
+        return np.tensordot(self._input_weights(inputs), self.prob_table, axes=1)
+
+    def transition_matrix(self, inputs=None):
+        """Матрица переходов цепи Маркова по состояниям: P[z, z'] за один шаг"""
+        to_state = np.eye(len(self.state_names))[self.outcome_state]
+        return self.outcome_probabilities(inputs) @ to_state
+
+    def state_distribution(self, k, inputs=None, initial_state='Исправен'):
+        """Распределение состояний через k шагов; степень матрицы - повторным возведением в квадрат"""
+        if k < 0:
+            raise ValueError("число шагов не может быть отрицательным")
+        start = np.eye(len(self.state_names))[self.state_names.index(initial_state)]
+        return start @ np.linalg.matrix_power(self.transition_matrix(inputs), k)
+
+    def broken_probability(self, k, inputs=None, initial_state='Исправен'):
+        """Вероятность быть в состоянии 'Сломан' через k шагов"""
+        return float(self.state_distribution(k, inputs, initial_state)[self.state_names.index('Сломан')])
+
+    def stationary_distribution(self, inputs=None):
+        """Стационарное распределение состояний: pi P = pi, сумма pi = 1"""
+        P = self.transition_matrix(inputs)
+        n = len(P)
+        # одно из уравнений pi (P - I) = 0 лишнее - заменяем его условием нормировки
+        A = (P - np.eye(n)).T
+        A[-1] = 1.0
+        b = np.zeros(n)
+        b[-1] = 1.0
+        return np.linalg.solve(A, b)
+
+    def stationary_error_rate(self, inputs=None):
+        """Доля ошибочных выходных сигналов в установившемся режиме"""
+        is_error = self.outcome_output == self.output_names.index('ошибочный')
+        return float(self.stationary_distribution(inputs) @ self.outcome_probabilities(inputs) @ is_error)
+
+    def expected_time_to_failure(self, inputs=None, initial_state='Исправен'):
+        """Среднее число шагов до первого попадания в 'Сломан' (inf, если поломка невозможна).
+
+        Время t(z) для исправных состояний - решение (I - Q) t = 1, где Q -
+        переходы между ними; из 'Сломан' считается время до следующей поломки.
+        """
+        P = self.transition_matrix(inputs)
+        broken = self.state_names.index('Сломан')
+        working = [i for i in range(len(P)) if i != broken]
+        Q = P[np.ix_(working, working)]
+        try:
+            times = np.linalg.solve(np.eye(len(working)) - Q, np.ones(len(working)))
+        except np.linalg.LinAlgError:
+            return float('inf')
+        hitting = np.zeros(len(P))
+        hitting[working] = times
+        if initial_state == 'Сломан':
+            return float(1 + P[broken] @ hitting)
+        return float(hitting[self.state_names.index(initial_state)])
+
     def simulate(self):
         # Начальное состояние всегда "Исправен"
         current_state = "Исправен"
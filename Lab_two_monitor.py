@@ -0,0 +1,181 @@
+"""Оценка скрытого состояния автоматов Lab_two по их выходным сигналам.
+
+Состояние автомата (Исправен/Сломан) не наблюдается, а выходной сигнал
+(правильный/ошибочный) выдается вместе с переходом по вероятностям
+prob_matrix. Это скрытая марковская модель, и вероятность поломки каждого
+автомата считается прямым алгоритмом (фильтр) по мере поступления записей,
+а по сохраненному журналу - прямым-обратным алгоритмом (сглаживание).
+
+Записи "machine_id,input_code,output_code" (коды - индексы в input_names и
+output_names StateMachine).
+
+Пример:
+    python -m Lab_two_monitor events.csv --threshold 0.9
+"""
+import argparse
+import sys
+from itertools import islice
+
+import numpy as np
+
+from Lab_one_fleet import event_rounds
+from Lab_two import StateMachine
+
+
+def joint_table(machine):
+    """[вход, состояние, новое состояние, выход] -> вероятность перехода с этим выходом"""
+    num_states = len(machine.state_names)
+    table = np.zeros((len(machine.input_names), num_states, num_states, len(machine.output_names)))
+    for k, (state, output) in enumerate(zip(machine.outcome_state, machine.outcome_output)):
+        table[:, :, state, output] += machine.prob_table[:, :, k]
+    return table
+
+
+class BeliefFilter:
+    """Вероятности состояний парка автоматов, обновляемые по пачкам наблюдений.
+
+    На автомат хранится только распределение по состояниям и накопленный
+    логарифм правдоподобия его выходов.
+    """
+
+    def __init__(self, machine=None, num_machines=0, initial_state='Исправен'):
+        self.machine = machine or StateMachine()
+        self.joint = joint_table(self.machine)
+        self.prior = np.eye(len(self.machine.state_names))[self.machine.state_names.index(initial_state)]
+        self.broken_code = self.machine.state_names.index('Сломан')
+        self.beliefs = np.tile(self.prior, (num_machines, 1))
+        self.log_likelihood = np.zeros(num_machines)
+        self.impossible = 0
+        self.processed = 0
+
+    def _ensure_capacity(self, max_id):
+        if max_id >= len(self.beliefs):
+            size = max(max_id + 1, 2 * len(self.beliefs))
+            beliefs = np.tile(self.prior, (size, 1))
+            beliefs[:len(self.beliefs)] = self.beliefs
+            log_likelihood = np.zeros(size)
+            log_likelihood[:len(self.log_likelihood)] = self.log_likelihood
+            self.beliefs, self.log_likelihood = beliefs, log_likelihood
+
+    def update(self, machine_ids, input_codes, output_codes):
+        """Учет пачки наблюдений; возвращает вероятность поломки после каждой записи.
+
+        Наблюдение с нулевой вероятностью при текущей оценке (таблица его
+        запрещает) не меняет правдоподобие: оценка заменяется прогнозом без
+        учета выхода, а такие записи считаются в impossible.
+        """
+        machine_ids = np.asarray(machine_ids, dtype=np.intp)
+        input_codes = np.asarray(input_codes, dtype=np.intp)
+        output_codes = np.asarray(output_codes, dtype=np.intp)
+        broken = np.empty(len(machine_ids))
+        if not len(machine_ids):
+            return broken
+        if machine_ids.min() < 0:
+            raise ValueError("номер автомата не может быть отрицательным")
+        if input_codes.min() < 0 or input_codes.max() >= self.joint.shape[0]:
+            raise ValueError(f"коды входов должны быть от 0 до {self.joint.shape[0] - 1}")
+        if output_codes.min() < 0 or output_codes.max() >= self.joint.shape[3]:
+            raise ValueError(f"коды выходов должны быть от 0 до {self.joint.shape[3] - 1}")
+        self._ensure_capacity(int(machine_ids.max()))
+
+        rounds, overflow = event_rounds(machine_ids)
+        # события сверх предела раундов - по одному, в порядке записей
+        for events in rounds + [overflow[i:i + 1] for i in range(len(overflow))]:
+            ids = machine_ids[events]
+            transitions = self.joint[input_codes[events], :, :, output_codes[events]]
+            unnormalized = np.einsum('ns,nst->nt', self.beliefs[ids], transitions)
+            evidence = unnormalized.sum(axis=1)
+            impossible = evidence <= 0
+            if impossible.any():
+                predicted = np.einsum('ns,nst->nt', self.beliefs[ids[impossible]],
+                                      self.joint[input_codes[events][impossible]].sum(axis=3))
+                unnormalized[impossible] = predicted
+                evidence[impossible] = 1.0
+                self.impossible += int(impossible.sum())
+            self.beliefs[ids] = unnormalized / evidence[:, None]
+            self.log_likelihood[ids] += np.log(evidence)
+            broken[events] = self.beliefs[ids, self.broken_code]
+        self.processed += len(machine_ids)
+        return broken
+
+    def broken_probability(self):
+        """Текущая вероятность поломки каждого автомата"""
+        return self.beliefs[:, self.broken_code]
+
+    def probably_broken(self, threshold=0.5):
+        """Номера автоматов, сломанных с вероятностью не меньше threshold"""
+        return np.flatnonzero(self.broken_probability() >= threshold)
+
+
+def smooth(input_codes, output_codes, machine=None, initial_state='Исправен'):
+    """Сглаженные вероятности состояний по полному журналу (прямой-обратный алгоритм).
+
+    input_codes и output_codes - массивы (T, N) для N автоматов (или (T,)
+    для одного; входы можно задать одним числом). Возвращает массив (T, N, S)
+    вероятностей состояния после каждого шага с учетом всех наблюдений и
+    логарифмы правдоподобия журналов (N,). Прямые и обратные вероятности
+    нормируются на каждом шаге, поэтому длинные журналы не дают потери
+    точности.
+    """
+    machine = machine or StateMachine()
+    joint = joint_table(machine)
+    output_codes = np.asarray(output_codes, dtype=np.intp)
+    single = output_codes.ndim == 1
+    if single:
+        output_codes = output_codes[:, None]
+    input_codes = np.asarray(input_codes, dtype=np.intp)
+    if input_codes.ndim == 1:
+        input_codes = input_codes[:, None]
+    input_codes = np.broadcast_to(input_codes, output_codes.shape)
+    num_steps, num_machines = output_codes.shape
+    num_states = joint.shape[1]
+
+    start = np.eye(num_states)[machine.state_names.index(initial_state)]
+    alpha = np.tile(start, (num_machines, 1))
+    forward = np.empty((num_steps, num_machines, num_states))
+    log_likelihood = np.zeros(num_machines)
+    for t in range(num_steps):
+        alpha = np.einsum('ns,nst->nt', alpha, joint[input_codes[t], :, :, output_codes[t]])
+        evidence = alpha.sum(axis=1)
+        if (evidence <= 0).any():
+            raise ValueError(f"наблюдения на шаге {t} невозможны при заданных вероятностях")
+        alpha /= evidence[:, None]
+        log_likelihood += np.log(evidence)
+        forward[t] = alpha
+
+    # обратный проход: beta(t) - вероятность наблюдений после шага t при состоянии после шага t
+    beta = np.ones((num_machines, num_states))
+    posterior = forward
+    for t in range(num_steps - 1, -1, -1):
+        posterior[t] = forward[t] * beta
+        posterior[t] /= posterior[t].sum(axis=1, keepdims=True)
+        if t:
+            beta = np.einsum('nst,nt->ns', joint[input_codes[t], :, :, output_codes[t]], beta)
+            beta /= beta.sum(axis=1, keepdims=True)
+    if single:
+        return posterior[:, 0], log_likelihood[0]
+    return posterior, log_likelihood
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Оценка поломок автоматов по выходным сигналам")
+    parser.add_argument('events', help="файл записей machine_id,input_code,output_code")
+    parser.add_argument('--threshold', type=float, default=0.5, help="порог вероятности поломки")
+    parser.add_argument('--batch', type=int, default=1 << 20, help="записей в одной пачке")
+    args = parser.parse_args(argv)
+
+    monitor = BeliefFilter()
+    with open(args.events, encoding='utf-8') as f:
+        while chunk := list(islice(f, args.batch)):
+            lines = [line for line in chunk if line.strip()]
+            if lines:
+                records = np.loadtxt(lines, delimiter=',', dtype=np.int64, ndmin=2)
+                monitor.update(records[:, 0], records[:, 1], records[:, 2])
+
+    for machine_id in monitor.probably_broken(args.threshold):
+        print(f"{machine_id},{monitor.broken_probability()[machine_id]:.4f}")
+    print(f"обработано записей: {monitor.processed}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
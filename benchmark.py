@@ -0,0 +1,336 @@
+"""Замеры производительности моделей без GUI и ввода с клавиатуры.
+
+Для каждого случая считается пропускная способность (переходов или
+клиентов в секунду) и пик памяти (tracemalloc, отдельным прогоном), по
+желанию - горячие точки cProfile. Результаты можно сохранить как базу и
+сравнивать с ней следующие замеры; падение скорости или рост памяти
+больше допуска считается регрессией, и процесс завершается с кодом 1.
+
+Запуск:
+    python benchmark.py
+    python benchmark.py --quick --profile --save baseline.json
+    python benchmark.py --compare baseline.json --tolerance 0.25
+"""
+import argparse
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import Lab_one
+from Lab_two import StateMachine
+from Lab_three import EnhancedQueueSimulation
+
+
+def _time_loops(func, loops):
+    start = time.perf_counter()
+    for _ in range(loops):
+        result = func()
+    return result, time.perf_counter() - start
+
+
+def measure(func, memory=True, repeat=5, min_time=0.2):
+    """Результат, время одного вызова func() и пик памяти (с memory=True).
+
+    Как в timeit.autorange, число вызовов в замере удваивается, пока замер
+    не займет min_time секунд; время вызова - лучшее из repeat замеров, так
+    что короткие случаи не зависят от шума таймера и планировщика. Под
+    tracemalloc код работает в разы медленнее, поэтому память меряется
+    отдельным прогоном; func должна быть повторяемой.
+    """
+    loops = 1
+    while True:
+        result, elapsed = _time_loops(func, loops)
+        if elapsed >= min_time:
+            break
+        loops *= 2
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        best = min(best, _time_loops(func, loops)[1] / loops)
+    elapsed = best
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def profile_hotspots(func, limit=10):
+    """Функции с наибольшим собственным временем под cProfile"""
+    profiler = cProfile.Profile()
+    profiler.runcall(func)
+    stats = pstats.Stats(profiler).stats
+    top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [{
+        'function': f'{os.path.basename(path)}:{line}({name})',
+        'calls': calls,
+        'tottime': tottime,
+        'cumtime': cumtime,
+    } for (path, line, name), (_, calls, tottime, cumtime, _) in top]
+
+
+class Case:
+    """Замеряемый случай: func - повторяемый вызов, count(result) - число переходов или клиентов"""
+
+    def __init__(self, group, name, unit, func, count, **extra):
+        self.group = group
+        self.name = name
+        self.unit = unit
+        self.func = func
+        self.count = count
+        self.extra = extra
+
+    def measure(self, memory=True):
+        result, elapsed, peak = measure(self.func, memory)
+        count = self.count(result) if callable(self.count) else self.count
+        return dict({
+            'group': self.group,
+            'name': self.name,
+            'unit': self.unit,
+            'count': count,
+            'seconds': elapsed,
+            'throughput': count / elapsed if elapsed > 0 else float('inf'),
+            'peak_memory': peak,
+        }, **self.extra)
+
+
+def queue_engine_cases(arrival_rates=(0.5, 2.0, 10.0), run_counts=(1, 20), engines=('simpy', 'heap', 'numpy')):
+    """Клиентов в секунду для каждого движка на одинаковых параметрах и seed.
+
+    Для 'simpy' и 'heap' run_chunk - это run_single_simulation на каждый
+    прогон, для 'numpy' - один векторизованный пакет.
+    """
+    def runner(arrival_rate, num_runs, engine):
+        def run():
+            sim = EnhancedQueueSimulation(arrival_rate, num_runs, engine=engine, batch_size=num_runs, seed=0)
+            return sim.run_chunk(num_runs)
+        return run
+
+    return [Case('Lab_three', f'{engine}/rate={arrival_rate:g}/runs={num_runs}', 'клиентов/с',
+                 runner(arrival_rate, num_runs, engine), lambda results: sum(r['total_customers'] for r in results),
+                 arrival_rate=arrival_rate, engine=engine, runs=num_runs)
+            for arrival_rate in arrival_rates for num_runs in run_counts for engine in engines]
+
+
+def vending_automaton_cases(lengths=(10_000, 1_000_000, 10_000_000), function_calls=20_000):
+    """Переходов в секунду: function по одному вызову против VendingAutomaton.run.
+
+    function печатает на каждом вызове, поэтому она меряется на первых
+    function_calls входах с выводом в os.devnull, а результат сверяется с
+    пакетным прогоном.
+    """
+    automaton = Lab_one.VendingAutomaton()
+    rng = np.random.default_rng(0)
+    cases = []
+    for length in lengths:
+        codes = rng.integers(0, automaton.num_inputs, length)
+        cases.append(Case('Lab_one', f'run/length={length}', 'переходов/с',
+                          lambda codes=codes: automaton.run(codes), length))
+
+    prefix = codes[:function_calls].tolist()
+
+    def call_function():
+        z = Lab_one.INITIAL_STATE
+        visited = []
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for x in prefix:
+                z = Lab_one.function(x, z)
+                visited.append(z)
+        return visited
+
+    states, _ = automaton.run(codes[:function_calls])
+    if states.tolist() != call_function():
+        raise AssertionError("VendingAutomaton.run расходится с function")
+    cases.append(Case('Lab_one', f'function/calls={len(prefix)}', 'переходов/с', call_function, len(prefix)))
+    return cases
+
+
+def state_machine_cases(steps=1_000_000, machines=100_000, batch_steps=20):
+    """Переходов в секунду: StateMachine.get_transition по шагам и simulate_batch по ансамблю"""
+    machine = StateMachine()
+    rng = np.random.default_rng(0)
+    input_codes = rng.integers(0, len(machine.input_names), steps)
+    random_values = rng.random(steps)
+    signals = [machine.input_names[code] for code in input_codes.tolist()]
+    values = random_values.tolist()
+
+    def call_transition(steps=steps):
+        state = 'Исправен'
+        visited = []
+        for signal, value in zip(signals[:steps], values[:steps]):
+            state, _ = machine.get_transition(state, signal, value)
+            visited.append(state)
+        return visited
+
+    # один автомат из simulate_batch на тех же числах должен пройти тот же путь
+    check = min(steps, 10_000)
+    states, _ = machine.simulate_batch(1, check, inputs=input_codes[:check],
+                                       random_values=random_values[:check, None])
+    if [machine.state_names[code] for code in states[:, 0].tolist()] != call_transition(check):
+        raise AssertionError("simulate_batch расходится с get_transition")
+
+    return [
+        Case('Lab_two', f'get_transition/steps={steps}', 'переходов/с', call_transition, steps),
+        Case('Lab_two', f'simulate_batch/machines={machines}/steps={batch_steps}', 'переходов/с',
+             lambda: machine.simulate_batch(machines, batch_steps, seed=0), machines * batch_steps),
+    ]
+
+
+def benchmark_cases(quick=False):
+    if quick:
+        return (vending_automaton_cases(lengths=(10_000, 1_000_000), function_calls=5_000)
+                + state_machine_cases(steps=100_000, machines=10_000)
+                + queue_engine_cases(arrival_rates=(2.0,), run_counts=(1, 5)))
+    return vending_automaton_cases() + state_machine_cases() + queue_engine_cases()
+
+
+def collect_hotspots(quick=False, limit=10):
+    """Горячие точки по одному характерному случаю каждой модели"""
+    scale = 10 if quick else 1
+    automaton = Lab_one.VendingAutomaton()
+    codes = np.random.default_rng(0).integers(0, automaton.num_inputs, 1_000_000 // scale)
+    machine = StateMachine()
+    values = np.random.default_rng(0).random(200_000 // scale).tolist()
+
+    def transitions():
+        state = 'Исправен'
+        for value in values:
+            state, _ = machine.get_transition(state, 'внесение денег', value)
+
+    def engine_runs(engine):
+        return lambda: EnhancedQueueSimulation(2.0, 20 // scale, engine=engine, seed=0).run_chunk(20 // scale)
+
+    cases = {
+        'Lab_one/run': lambda: automaton.run(codes),
+        'Lab_two/get_transition': transitions,
+        'Lab_three/simpy': engine_runs('simpy'),
+        'Lab_three/heap': engine_runs('heap'),
+        'Lab_three/numpy': engine_runs('numpy'),
+    }
+    return {name: profile_hotspots(func, limit) for name, func in cases.items()}
+
+
+def find_regressions(rows, baseline, tolerance=0.25):
+    """Случаи, где скорость упала или пик памяти вырос больше чем на долю tolerance.
+
+    Возвращает список регрессий и имена случаев, которых нет в базе.
+    """
+    previous = {row['name']: row for row in baseline['results']}
+    regressions = []
+    missing = []
+    for row in rows:
+        old = previous.get(row['name'])
+        if old is None:
+            missing.append(row['name'])
+            continue
+        if row['throughput'] < old['throughput'] * (1 - tolerance):
+            regressions.append({'name': row['name'], 'metric': 'throughput',
+                                'baseline': old['throughput'], 'current': row['throughput']})
+        if row['peak_memory'] and old.get('peak_memory') and row['peak_memory'] > old['peak_memory'] * (1 + tolerance):
+            regressions.append({'name': row['name'], 'metric': 'peak_memory',
+                                'baseline': old['peak_memory'], 'current': row['peak_memory']})
+    return regressions, missing
+
+
+def make_baseline(rows, hotspots=None):
+    """Результаты замеров со сведениями об окружении - для сохранения в JSON"""
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'results': rows,
+        'hotspots': hotspots,
+    }
+
+
+def print_rows(rows):
+    group = None
+    for row in rows:
+        if row['group'] != group:
+            group = row['group']
+            print(f"\n{group}")
+            print(f"{'случай':<44} {'сек':>8} {'в секунду':>14} {'ед.':<12} {'пик, МБ':>8}")
+        peak = '-' if row['peak_memory'] is None else f"{row['peak_memory'] / 2 ** 20:.1f}"
+        print(f"{row['name']:<44} {row['seconds']:>8.3f} {row['throughput']:>14.0f} {row['unit']:<12} {peak:>8}")
+
+
+def print_hotspots(hotspots):
+    for name, entries in hotspots.items():
+        print(f"\nГорячие точки: {name}")
+        print(f"{'собств., с':>10} {'всего, с':>10} {'вызовов':>10}  функция")
+        for entry in entries:
+            print(f"{entry['tottime']:>10.3f} {entry['cumtime']:>10.3f} {entry['calls']:>10}  {entry['function']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности моделей")
+    parser.add_argument('--quick', action='store_true', help="уменьшенные размеры для быстрой проверки")
+    parser.add_argument('--no-memory', action='store_true', help="без замера пика памяти")
+    parser.add_argument('--profile', action='store_true', help="горячие точки cProfile")
+    parser.add_argument('--top', type=int, default=10, help="строк в списке горячих точек")
+    parser.add_argument('--save', help="сохранить результаты как базу в JSON")
+    parser.add_argument('--compare', help="сравнить с базой из JSON")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="допустимое ухудшение, доля")
+    parser.add_argument('--retries', type=int, default=2,
+                        help="повторных замеров случая, замедлившегося относительно базы")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    cases = benchmark_cases(args.quick)
+    rows = [case.measure(memory=not args.no_memory) for case in cases]
+    print_rows(rows)
+    hotspots = collect_hotspots(args.quick, args.top) if args.profile else None
+    if hotspots:
+        print_hotspots(hotspots)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(make_baseline(rows, hotspots), f, ensure_ascii=False, indent=2)
+
+    if baseline is not None:
+        regressions, missing = find_regressions(rows, baseline, args.tolerance)
+        # скорость на общей машине плавает; замедление засчитывается, только если повторяется
+        for _ in range(args.retries):
+            slow = {r['name'] for r in regressions if r['metric'] == 'throughput'}
+            if not slow:
+                break
+            for case, row in zip(cases, rows):
+                if case.name in slow:
+                    again = case.measure(memory=False)
+                    if again['throughput'] > row['throughput']:
+                        row.update(seconds=again['seconds'], throughput=again['throughput'])
+            regressions, missing = find_regressions(rows, baseline, args.tolerance)
+        if len(missing) == len(rows):
+            # например, быстрый замер против полной базы: сравнивать нечего
+            print(f"\nНи один случай не найден в {args.compare}; нужна база с теми же размерами (--quick)",
+                  file=sys.stderr)
+            sys.exit(1)
+        if missing:
+            print(f"\nНет в базе, не сравнивались: {', '.join(missing)}", file=sys.stderr)
+        if regressions:
+            print(f"\nРегрессии относительно {args.compare}:")
+            for r in regressions:
+                print(f"  {r['name']}: {r['metric']} {r['baseline']:.4g} -> {r['current']:.4g}")
+            sys.exit(1)
+        print(f"\nРегрессий относительно {args.compare} нет")
+
+
+if __name__ == "__main__":
+    main()
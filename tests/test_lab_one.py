@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from Lab_one import MATRIX_TWO, STATES, VendingAutomaton, function
+
+
+@pytest.mark.parametrize('initial_state', range(len(STATES)))
+def test_run_parallel_matches_run_and_function(initial_state, capsys):
+    automaton = VendingAutomaton()
+    # 1003 входа: куски по 37 с неполным последним, внутри кусков - неполные блоки
+    codes = np.random.default_rng(initial_state).integers(0, automaton.num_inputs, 1003)
+
+    states, outputs = automaton.run_parallel(codes, initial_state, workers=2, chunk_size=37)
+    expected_states, expected_outputs = automaton.run(codes, initial_state)
+    np.testing.assert_array_equal(states, expected_states)
+    np.testing.assert_array_equal(outputs, expected_outputs)
+
+    z = initial_state
+    for i, x in enumerate(codes.tolist()):
+        assert outputs[i] == MATRIX_TWO[x][z]
+        z = function(x, z)
+        assert states[i] == z
+    capsys.readouterr()
@@ -0,0 +1,40 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+from Lab_one import VendingAutomaton
+from Lab_one_fleet import FleetProcessor, event_rounds, process_file
+
+
+def test_process_batch_matches_per_machine_automaton():
+    rng = np.random.default_rng(0)
+    automaton = VendingAutomaton()
+    machine_ids = rng.integers(0, 50, 20_000)
+    # один "горячий" автомат с событиями сверх max_rounds в каждой пачке
+    machine_ids[rng.choice(len(machine_ids), 2_000, replace=False)] = 7
+    input_codes = rng.integers(0, automaton.num_inputs, len(machine_ids))
+
+    processor = FleetProcessor()
+    batches = np.array_split(np.arange(len(machine_ids)), 5)
+    assert len(event_rounds(machine_ids[batches[0]])[1])
+    outputs = np.concatenate([processor.process_batch(machine_ids[events], input_codes[events])
+                              for events in batches])
+
+    for machine in np.unique(machine_ids):
+        events = np.flatnonzero(machine_ids == machine)
+        states, expected = automaton.run(input_codes[events])
+        np.testing.assert_array_equal(outputs[events], expected)
+        assert processor.states[machine] == states[-1]
+    assert processor.processed == len(machine_ids)
+
+
+def test_parse_error_ends_process_file(tmp_path):
+    path = tmp_path / 'events.csv'
+    lines = [f'{i % 10},{i % 4}\n' for i in range(5_000)]
+    lines[2_500] = 'не число,1\n'
+    path.write_text(''.join(lines), encoding='utf-8')
+    # при ошибке разбора конвейер раньше ждал следующую пачку вечно
+    with pytest.raises(ValueError):
+        asyncio.run(asyncio.wait_for(process_file(str(path), io.BytesIO(), chunk_size=1 << 10), timeout=10))
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from Lab_three import SERVICE_DISTRIBUTIONS, EnhancedQueueSimulation, compare_engines
+
+
+def test_numpy_engine_agrees_with_simpy():
+    comparison = compare_engines(2, num_runs=200, seed=1)
+    assert any(key.startswith('utilization_') for key in comparison)
+    for metric, entry in comparison.items():
+        assert abs(entry['z']) < 3, (metric, entry)
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('distribution', SERVICE_DISTRIBUTIONS)
+def test_heap_engine_matches_simpy_for_same_seed(seed, distribution):
+    histories = []
+    for engine in ('simpy', 'heap'):
+        sim = EnhancedQueueSimulation(3, 4, engine=engine, seed=seed, keep_history=True,
+                                      service_times=(3, 4, 5, 6, 7), service_distribution=distribution)
+        sim.run()
+        histories.append(sim.history)
+    np.testing.assert_array_equal(histories[0], histories[1])
+
+
+def test_simpy_workers_match_sequential():
+    histories = []
+    for workers in (1, 2):
+        sim = EnhancedQueueSimulation(2, 20, engine='simpy', workers=workers, chunk_size=3, seed=5,
+                                      keep_history=True)
+        sim.run()
+        histories.append(sim.history)
+    np.testing.assert_array_equal(histories[0], histories[1])
+
+
+def run_history(**kwargs):
+    sim = EnhancedQueueSimulation(keep_history=True, **kwargs)
+    sim.run()
+    return sim
+
+
+@pytest.mark.parametrize('engine', ('heap', 'numpy'))
+def test_parallel_chunks_match_sequential(engine):
+    params = dict(arrival_rate=2, num_runs=40, engine=engine, seed=11, batch_size=7)
+    sequential = run_history(**params)
+    parallel = run_history(workers=2, chunk_size=9, **params)
+    np.testing.assert_array_equal(sequential.history, parallel.history)
+    np.testing.assert_array_equal(sequential.metric_stats.mean, parallel.metric_stats.mean)
+
+
+def test_antithetic_pairs_survive_odd_chunk_boundaries():
+    params = dict(arrival_rate=2, num_runs=30, engine='heap', seed=4, antithetic=True,
+                  service_distribution='exponential')
+    sequential = run_history(**params)
+    parallel = run_history(workers=2, chunk_size=3, **params)
+    np.testing.assert_array_equal(sequential.history, parallel.history)
+    np.testing.assert_array_equal(sequential.metric_stats.mean, parallel.metric_stats.mean)
+    # наблюдение статистики - среднее пары репликаций с u и 1 - u
+    assert sequential.metric_stats.count == 15
+    pairs = sequential.history['refusal_rate'].reshape(-1, 2).mean(axis=1)
+    assert sequential.metric_stats.mean[3] == pytest.approx(pairs.mean())
+    assert sequential.replication_stream(6).spawn_key == sequential.replication_stream(7).spawn_key
+
+
+def test_alternative_uses_common_random_numbers():
+    params = dict(arrival_rate=2, num_runs=30, engine='heap', seed=8, service_distribution='uniform')
+    alternative = {'arrival_rate': 2.5, 'service_times': (3, 4, 5)}
+    sim = run_history(alternative=alternative, **params)
+    # альтернатива в паре получает те же потоки, что и отдельная модель с тем же seed
+    standalone = run_history(**dict(params, **alternative))
+    results = sim.get_results()
+    difference = results['paired_difference']
+    for i, metric in enumerate(EnhancedQueueSimulation.METRICS):
+        assert difference['alternative_means'][metric] == pytest.approx(standalone.metric_stats.mean[i])
+        assert difference['mean'][metric] == pytest.approx(standalone.metric_stats.mean[i]
+                                                           - sim.metric_stats.mean[i])
+    assert difference['variance_reduction']['refusal_rate'] > 1
+
+    parallel = run_history(alternative=alternative, workers=2, chunk_size=7, **params)
+    parallel_difference = parallel.get_results()['paired_difference']
+    for key in ('alternative_means', 'mean', 'ci', 'variance_reduction'):
+        assert parallel_difference[key] == difference[key]
+
+
+def test_identical_alternative_has_zero_difference():
+    sim = run_history(arrival_rate=2, num_runs=10, engine='heap', seed=2, alternative={'arrival_rate': 2})
+    difference = sim.get_results()['paired_difference']
+    assert all(value == 0 for value in difference['mean'].values())
+    assert all(value == 0 for value in difference['ci'].values())
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import Lab_three_sweep
+from Lab_three_sweep import find_threshold, main
+
+
+def test_find_threshold_rejects_threshold_outside_bracket():
+    with pytest.raises(ValueError):
+        find_threshold(5, 0.1, 0.2, analytic=True)
+
+
+def test_find_threshold_rejects_noise_flipped_bracket(monkeypatch):
+    # доля отказов растет со скоростью, но шум переставляет точки по обе стороны от 0.5
+    def noisy_points(points, cache, workers=1):
+        rates = [point['arrival_rate'] for point in points]
+        return [{'refusal_rate': 10 * rate + 3 * ((0.4 < rate < 0.5) - (0.5 < rate < 0.6))} for rate in rates]
+
+    monkeypatch.setattr(Lab_three_sweep, 'evaluate_points', noisy_points)
+    with pytest.raises(ValueError, match="немонотонна"):
+        find_threshold(5, 0.1, 1, workers=7, tolerance=0.0001)
+
+
+def test_overlapping_grids_share_cache_entries(tmp_path, capsys):
+    cache_dir = str(tmp_path)
+    common = ['--runs', '2', '--workers', '1', '--cache', cache_dir]
+    main(['--range', '0.1', '1', '0.1'] + common)
+    entries = set(os.listdir(cache_dir))
+    assert len(entries) == 10
+    main(['--range', '0.3', '1', '0.1'] + common)
+    main(['--rates', '0.3', '0.6', '0.7'] + common)
+    assert set(os.listdir(cache_dir)) == entries
+    capsys.readouterr()
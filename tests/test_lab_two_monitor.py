@@ -0,0 +1,77 @@
+from itertools import product
+
+import numpy as np
+
+from Lab_two import StateMachine
+from Lab_two_monitor import BeliefFilter, joint_table, smooth
+
+
+def brute_force(machine, input_codes, output_codes, initial_state=0):
+    """Маргинальные вероятности состояний и правдоподобие перебором всех путей"""
+    joint = joint_table(machine)
+    num_states = joint.shape[1]
+    marginals = np.zeros((len(output_codes), num_states))
+    likelihood = 0.0
+    for path in product(range(num_states), repeat=len(output_codes)):
+        probability = 1.0
+        previous = initial_state
+        for x, state, y in zip(input_codes, path, output_codes):
+            probability *= joint[x, previous, state, y]
+            previous = state
+        likelihood += probability
+        marginals[np.arange(len(path)), path] += probability
+    return marginals / likelihood, np.log(likelihood)
+
+
+def random_logs(num_steps, num_machines, seed):
+    rng = np.random.default_rng(seed)
+    machine = StateMachine()
+    input_codes = rng.integers(0, len(machine.input_names), (num_steps, num_machines))
+    output_codes = rng.integers(0, len(machine.output_names), (num_steps, num_machines))
+    return machine, input_codes, output_codes
+
+
+def test_smooth_matches_brute_force():
+    machine, input_codes, output_codes = random_logs(7, 3, seed=0)
+    posterior, log_likelihood = smooth(input_codes, output_codes, machine)
+    for n in range(input_codes.shape[1]):
+        marginals, expected = brute_force(machine, input_codes[:, n], output_codes[:, n])
+        np.testing.assert_allclose(posterior[:, n], marginals, atol=1e-12)
+        assert np.isclose(log_likelihood[n], expected)
+
+
+def test_filter_matches_last_smoothed_step():
+    machine, input_codes, output_codes = random_logs(50, 6, seed=1)
+    posterior, log_likelihood = smooth(input_codes, output_codes, machine)
+
+    # записи автоматов перемешаны внутри шага и поданы несколькими пачками
+    rng = np.random.default_rng(2)
+    order = np.concatenate([t * 6 + rng.permutation(6) for t in range(50)])
+    machine_ids = np.tile(np.arange(6), 50)
+    monitor = BeliefFilter(machine)
+    for events in np.array_split(order, 7):
+        monitor.update(machine_ids[events], input_codes.ravel()[events], output_codes.ravel()[events])
+
+    np.testing.assert_allclose(monitor.beliefs, posterior[-1], atol=1e-12)
+    np.testing.assert_allclose(monitor.log_likelihood, log_likelihood)
+    assert monitor.processed == 300
+    assert monitor.impossible == 0
+
+
+def test_impossible_observation_falls_back_to_prediction():
+    machine = StateMachine()
+    # исправный автомат всегда выдает правильный сигнал и ломается с вероятностью 0.5
+    for key in machine.prob_matrix:
+        if key[1] == 'Исправен':
+            machine.prob_matrix[key] = [0.5, 0.0, 0.5, 0.0]
+    machine.compile_tables()
+    wrong = machine.output_names.index('ошибочный')
+
+    monitor = BeliefFilter(machine, num_machines=2)
+    broken = monitor.update([0, 1], [0, 0], [wrong, 1 - wrong])
+    assert monitor.impossible == 1
+    assert broken[0] == 0.5
+    assert monitor.log_likelihood[0] == 0.0
+    # возможное наблюдение учитывается как обычно
+    assert broken[1] == 0.5
+    assert monitor.log_likelihood[1] == 0.0